@@ -1,29 +1,49 @@
 #!/usr/bin/env python3
 """CLI management tool for Semantic Search MCP collections."""
 
+import heapq
 import os
+import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
 from datetime import datetime
 
 # Import shared utilities
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 from code_indexer.utils import (
-    should_ignore_path,
     generate_collection_name,
-    is_file_indexable
+    iter_files,
+    load_file_chunks_batch,
+    create_file_executor,
+    generate_chunk_id,
+    create_chunk_metadata,
+    diff_file_mtimes,
+    enable_wal_mode,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP
 )
+from code_indexer.file_mtimes import update_file_mtimes, remove_file_mtimes
+from code_indexer.embeddings import embed_documents
 from code_indexer.config import (
-    get_allowed_extensions,
+    is_allowed_extension,
     get_ignore_patterns,
     get_max_file_size
 )
 
+# Chunks buffered per collection.upsert() call during add_workspace
+BATCH_CHUNKS = 250
 
 def get_client():
     """Get ChromaDB client."""
+    try:
+        enable_wal_mode("./chroma_db")
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not enable WAL mode: {e}")
+    
     try:
         return chromadb.PersistentClient(
             path="./chroma_db",
@@ -34,15 +54,31 @@ def get_client():
         sys.exit(1)
 
 
+def _walk_size(path):
+    """Sum file sizes under path in bytes using cached DirEntry stats."""
+    total_size = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    total_size += _walk_size(entry.path)
+                elif entry.is_file():
+                    total_size += entry.stat().st_size
+    except OSError:
+        # Unreadable directories are skipped, matching os.walk
+        pass
+    return total_size
+
+
 def get_folder_size(path):
     """Get folder size in MB."""
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(path):
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            if os.path.exists(filepath):
-                total_size += os.path.getsize(filepath)
-    return total_size / (1024 * 1024)  # Convert to MB
+    return _walk_size(path) / (1024 * 1024)  # Convert to MB
+
+
+def _fetch_collection_summary(col):
+    """Return a collection's chunk count and one sample record."""
+    # Get some metadata to estimate dates
+    return col.count(), col.get(limit=1)
 
 
 def list_collections():
@@ -50,18 +86,14 @@ def list_collections():
     client = get_client()
     collections = client.list_collections()
     
-    if not collections:
-        print("📭 No indexed projects found.")
-        return []
-    
-    print(f"\n📚 Found {len(collections)} indexed projects:\n")
+    # Fetch counts and samples concurrently; the listing is built in order below
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(_fetch_collection_summary, col) for col in collections]
     
     collection_info = []
-    for i, col in enumerate(collections, 1):
+    for i, (col, future) in enumerate(zip(collections, futures), 1):
         try:
-            count = col.count()
-            # Get some metadata to estimate dates
-            sample_data = col.get(limit=1)
+            count, sample_data = future.result()
             if sample_data['metadatas'] and sample_data['metadatas'][0]:
                 last_modified = sample_data['metadatas'][0].get('last_modified')
                 if last_modified:
@@ -74,7 +106,6 @@ def list_collections():
             # Estimate size (rough calculation)
             size_mb = count * 0.002  # Rough estimate: ~2KB per chunk
             
-            print(f"{i}. {col.name} {size_mb:.1f} MB ({count} chunks) - Last: {last_date}")
             collection_info.append({
                 'index': i,
                 'name': col.name,
@@ -84,19 +115,36 @@ def list_collections():
                 'last_date': last_date
             })
         except Exception as e:
-            print(f"{i}. {col.name} - Error reading collection: {e}")
             collection_info.append({
                 'index': i,
                 'name': col.name,
                 'collection': col,
                 'count': 0,
                 'size_mb': 0,
-                'last_date': "Error"
+                'last_date': "Error",
+                'error': str(e)
             })
     
+    print_collections(collection_info)
     return collection_info
 
 
+def print_collections(collection_info):
+    """Print a collection listing gathered by list_collections."""
+    if not collection_info:
+        print("📭 No indexed projects found.")
+        return
+    
+    print(f"\n📚 Found {len(collection_info)} indexed projects:\n")
+    
+    for info in collection_info:
+        if 'error' in info:
+            print(f"{info['index']}. {info['name']} - Error reading collection: {info['error']}")
+        else:
+            # last_modified is a file mtime, from one sample chunk
+            print(f"{info['index']}. {info['name']} {info['size_mb']:.1f} MB ({info['count']} chunks) - File modified: {info['last_date']}")
+
+
 def show_info(collection_info, index):
     """Show detailed info for a collection."""
     if index < 1 or index > len(collection_info):
@@ -112,30 +160,34 @@ def show_info(collection_info, index):
     print(f"Chunks: {info['count']}")
     
     try:
-        # Get all metadata to find first and last modified dates
-        all_data = col.get()
-        timestamps = []
-        
-        if all_data['metadatas']:
-            for metadata in all_data['metadatas']:
-                if metadata and 'last_modified' in metadata:
-                    timestamps.append(metadata['last_modified'])
-        
-        if timestamps:
-            first_modified = datetime.fromtimestamp(min(timestamps)).strftime('%Y-%m-%d %H:%M')
-            last_modified = datetime.fromtimestamp(max(timestamps)).strftime('%Y-%m-%d %H:%M')
+        # Only metadata is needed for dates, skip documents and embeddings; last_modified
+        # is the indexed file's mtime, not when it was indexed
+        all_data = col.get(include=["metadatas"])
+        timestamps = np.fromiter(
+            (
+                metadata['last_modified']
+                for metadata in all_data['metadatas'] or []
+                if metadata and 'last_modified' in metadata
+            ),
+            dtype=np.float64
+        )
+        
+        if timestamps.size:
+            first_timestamp, last_timestamp = float(timestamps.min()), float(timestamps.max())
+            first_modified = datetime.fromtimestamp(first_timestamp).strftime('%Y-%m-%d %H:%M')
+            last_modified = datetime.fromtimestamp(last_timestamp).strftime('%Y-%m-%d %H:%M')
             
-            print(f"First Indexed: {first_modified}")
-            print(f"Last Modified: {last_modified}")
+            print(f"Oldest File Modified: {first_modified}")
+            print(f"Newest File Modified: {last_modified}")
             
-            # Show how long we've been indexing this project
-            days_diff = (max(timestamps) - min(timestamps)) / (24 * 3600)
+            # Spread between the oldest and newest indexed file
+            days_diff = (last_timestamp - first_timestamp) / (24 * 3600)
             if days_diff < 1:
-                print("Indexing Duration: Less than 1 day")
+                print("File Modification Span: Less than 1 day")
             else:
-                print(f"Indexing Duration: {days_diff:.1f} days")
+                print(f"File Modification Span: {days_diff:.1f} days")
         else:
-            print("Modified Dates: Unknown")
+            print("File Modified Dates: Unknown")
             
     except Exception as e:
         print(f"Could not retrieve timestamp data: {e}")
@@ -157,43 +209,51 @@ def investigate_workspace(workspace_path):
             print(f"❌ Path is not a directory: {workspace_path}")
             return
         
-        allowed_extensions = get_allowed_extensions()
         ignore_patterns = get_ignore_patterns()
+        max_file_size = get_max_file_size()
         
         # Scan files
         valid_files = []
-        total_size = 0
-        by_extension = {}
+        extensions = []
         skipped_large = 0
+        scan_warnings = []
         
         print("📊 Scanning files...")
         
-        for file_path in workspace_dir.rglob("*"):
-            indexable, reason = is_file_indexable(file_path, allowed_extensions, ignore_patterns, get_max_file_size())
-            if not indexable:
-                if "file too large" in reason:
-                    skipped_large += 1
+        for entry in iter_files(workspace_dir, ignore_patterns):
+            name = entry.name
+            if not is_allowed_extension(name):
                 continue
+            ext = name[name.rfind('.'):].lower()
                 
             try:
-                file_size = file_path.stat().st_size
-                
-                ext = file_path.suffix.lower()
-                if ext not in by_extension:
-                    by_extension[ext] = {'count': 0, 'size': 0}
-                
-                by_extension[ext]['count'] += 1
-                by_extension[ext]['size'] += file_size
+                file_size = entry.stat().st_size
+                if file_size > max_file_size:
+                    skipped_large += 1
+                    continue
                 
-                valid_files.append((file_path, file_size))
-                total_size += file_size
+                valid_files.append((Path(entry.path), file_size))
+                extensions.append(ext)
                 
             except Exception as e:
-                print(f"⚠️  Error scanning {file_path}: {e}")
+                scan_warnings.append(f"Error scanning {entry.path}: {e}")
+        
+        # Totals and the per-extension breakdown are reduced in NumPy
+        sizes = np.fromiter((size for _, size in valid_files), dtype=np.int64, count=len(valid_files))
+        total_size = int(sizes.sum())
         
-        # Calculate estimates
+        ext_names, ext_index = np.unique(np.array(extensions, dtype=str), return_inverse=True)
+        ext_counts = np.bincount(ext_index, minlength=len(ext_names))
+        ext_sizes = np.bincount(ext_index, weights=sizes, minlength=len(ext_names))
+        by_extension = {
+            str(ext): {'count': int(count), 'size': int(size)}
+            for ext, count, size in zip(ext_names, ext_counts, ext_sizes)
+        }
+        
+        # Calculate estimates (mirrors chunk_text's window stride)
         collection_name = generate_collection_name(workspace_path)
-        estimated_chunks = sum(max(1, size // 200) for _, size in valid_files)  # Rough estimate: ~200 chars per chunk
+        chunk_stride = CHUNK_SIZE - CHUNK_OVERLAP
+        estimated_chunks = int(np.maximum(1, -(-(sizes - CHUNK_OVERLAP) // chunk_stride)).sum())
         estimated_time = len(valid_files) * 0.1  # Rough estimate: ~0.1 sec per file
         
         print("\n📋 Workspace Analysis Results:")
@@ -207,14 +267,16 @@ def investigate_workspace(workspace_path):
         if skipped_large > 0:
             print(f"⚠️  Skipped {skipped_large} files >1MB")
         
+        _print_warnings(scan_warnings)
+        
         # Show breakdown by file type
         if by_extension:
             print("\n📂 File breakdown:")
-            for ext, data in sorted(by_extension.items(), key=lambda x: x[1]['size'], reverse=True)[:8]:
+            for ext, data in heapq.nlargest(8, by_extension.items(), key=lambda x: x[1]['size']):
                 size_mb = data['size'] / 1024 / 1024
                 print(f"  • {ext}: {data['count']} files ({size_mb:.1f} MB)")
         
-        return len(valid_files), total_size, estimated_chunks, collection_name
+        return valid_files, total_size, estimated_chunks, collection_name
         
     except Exception as e:
         print(f"❌ Analysis failed: {e}")
@@ -301,8 +363,72 @@ def _generate_mcp_config(workspace_path):
     print(f"claude mcp add semantic-search --env WORKSPACE_PATH=\"{workspace_path}\" -- uv run --directory {script_dir} scripts/run_server.py")
 
 
+def _select_changed_files(collection, valid_files, root_str):
+    """Return the files that are new or modified since the collection last indexed them.
+    
+    Also returns {rel_path: [chunk IDs]} for the modified files' stored chunks,
+    so the ones not written again can be deleted once the new chunks are in.
+    """
+    existing = collection.get(include=["metadatas"])
+    indexed_mtimes = {}
+    stored_ids = {}
+    for chunk_id, metadata in zip(existing['ids'], existing['metadatas'] or []):
+        if metadata and metadata.get('file_path'):
+            rel_path = metadata['file_path']
+            indexed_mtimes[rel_path] = max(indexed_mtimes.get(rel_path, 0), metadata.get('last_modified', 0))
+            stored_ids.setdefault(rel_path, []).append(chunk_id)
+    
+    current_mtimes = {}
+    paths = {}
+    for file_path, _ in valid_files:
+        rel_path = os.path.relpath(file_path, root_str)
+        try:
+            current_mtimes[rel_path] = os.stat(file_path).st_mtime
+        except OSError:
+            # Gone since the scan
+            continue
+        paths[rel_path] = file_path
+    
+    # Same comparison (and mtime tolerance) as the server's modification check
+    new_paths, modified_paths, _ = diff_file_mtimes(indexed_mtimes, current_mtimes)
+    files_to_index = [paths[rel_path] for rel_path in new_paths + modified_paths]
+    return files_to_index, {rel_path: stored_ids[rel_path] for rel_path in modified_paths}
+
+
+def _print_warnings(messages, limit=5):
+    """Print a summary of warnings collected during a file loop."""
+    if not messages:
+        return
+    
+    print(f"⚠️  {len(messages)} warnings (first {min(limit, len(messages))}):")
+    for message in messages[:limit]:
+        print(f"  • {message}")
+
+
+def _flush_batch(collection, documents, ids, metadatas, written_ids):
+    """Upsert buffered chunks in a single call, add their IDs to written_ids and return how many were stored."""
+    if not ids:
+        return 0
+    
+    try:
+        collection.upsert(
+            documents=documents,
+            embeddings=embed_documents(documents),
+            ids=ids,
+            metadatas=metadatas
+        )
+        written_ids.update(ids)
+        return len(ids)
+    except Exception as e:
+        print(f"⚠️  Failed to add batch of {len(ids)} chunks: {e}")
+        return 0
+
+
 def add_workspace(workspace_path):
     """Add and index a workspace with progress tracking."""
+    # Absolute like the server's WORKSPACE_PATH, so the collection_root stored in
+    # chunk metadata and the sidecar doesn't depend on this process's cwd
+    workspace_path = str(Path(workspace_path).absolute())
     print(f"\n🚀 Adding workspace: {workspace_path}")
     
     # First, run investigation
@@ -310,7 +436,9 @@ def add_workspace(workspace_path):
     if not result:
         return
     
-    file_count, total_size, estimated_chunks, collection_name = result
+    # Reuse the scanned (path, size) list instead of walking the workspace again
+    valid_files, total_size, estimated_chunks, collection_name = result
+    file_count = len(valid_files)
     
     # Ask for confirmation
     size_mb = total_size / 1024 / 1024
@@ -334,66 +462,87 @@ def add_workspace(workspace_path):
         )
         
         workspace_dir = Path(workspace_path)
-        allowed_extensions = get_allowed_extensions()
-        ignore_patterns = get_ignore_patterns()
-        MAX_FILE_SIZE = 1024 * 1024
+        root_str = str(workspace_dir)
+        
+        files_to_index, stored_ids = _select_changed_files(collection, valid_files, root_str)
+        skipped = file_count - len(files_to_index)
+        if skipped:
+            print(f"⏭️  Skipping {skipped:,} files unchanged since they were last indexed")
+        file_count = len(files_to_index)
         
         files_processed = 0
         chunks_added = 0
+        index_warnings = []
+        # (mtime, chunk IDs) per file read, and the IDs Chroma accepted
+        file_chunk_ids = {}
+        written_ids = set()
         
-        # Get valid files list for progress tracking
-        valid_files = []
-        for file_path in workspace_dir.rglob("*"):
-            if (file_path.is_file() and 
-                file_path.suffix.lower() in allowed_extensions and
-                not should_ignore_path(file_path, ignore_patterns)):
-                
-                try:
-                    if file_path.stat().st_size <= MAX_FILE_SIZE:
-                        valid_files.append(file_path)
-                except Exception:
-                    continue
+        # Chunks are buffered and flushed in batches of BATCH_CHUNKS
+        pending_docs = []
+        pending_ids = []
+        pending_meta = []
         
-        print(f"📊 Processing {len(valid_files)} files...")
+        print(f"📊 Processing {file_count} files...")
         
-        for i, file_path in enumerate(valid_files):
-            try:
-                content = file_path.read_text(encoding='utf-8', errors='ignore')
-                
-                # Simple chunking - split on double newlines
-                chunks = [chunk.strip() for chunk in content.split('\n\n') if chunk.strip()]
-                
-                if chunks:
-                    import time
-                    current_time = time.time()
-                    
-                    ids = [f"{file_path.name}_{j}_{int(current_time)}" for j in range(len(chunks))]
-                    metadatas = [
-                        {
-                            "file_path": str(file_path.relative_to(workspace_dir)),
-                            "collection_root": str(workspace_dir),
-                            "last_modified": current_time
-                        } 
-                        for _ in chunks
-                    ]
-                    
-                    collection.add(
-                        documents=chunks,
-                        ids=ids,
-                        metadatas=metadatas
-                    )
-                    
-                    chunks_added += len(chunks)
-                    files_processed += 1
-                
-                # Progress update every 50 files
-                if (i + 1) % 50 == 0 or i == len(valid_files) - 1:
-                    progress = ((i + 1) / len(valid_files)) * 100
-                    print(f"Progress: {progress:5.1f}% | Files: {files_processed:,}/{len(valid_files):,} | Chunks: {chunks_added:,}")
+        # Read, chunk and hash files in parallel (processes for large workspaces);
+        # embedding and Chroma writes stay in this process
+        executor, files_per_task = create_file_executor(file_count, use_processes=True)
+        with executor:
+            futures = [
+                executor.submit(load_file_chunks_batch, files_to_index[i:i + files_per_task])
+                for i in range(0, file_count, files_per_task)
+            ]
+            
+            files_done = 0
+            for future in as_completed(futures):
+                for file_path, hashed_chunks, reason, mtime in future.result():
+                    if hashed_chunks is None and reason.startswith("read error"):
+                        index_warnings.append(f"Failed to index {file_path}: {reason}")
+                    else:
+                        rel_path = os.path.relpath(file_path, root_str)
+                        chunk_ids = []
+                        file_chunk_ids[rel_path] = (mtime, chunk_ids)
+                        
+                        # None here means binary content behind a text extension
+                        if hashed_chunks:
+                            # Content-hash IDs: re-adding unchanged content upserts in place
+                            for i, chunk, content_hash in hashed_chunks:
+                                chunk_ids.append(generate_chunk_id(rel_path, content_hash))
+                                pending_meta.append(create_chunk_metadata(file_path, workspace_dir, i, mtime, content_hash))
+                                pending_docs.append(chunk)
+                            pending_ids.extend(chunk_ids)
+                            files_processed += 1
+                            
+                            if len(pending_ids) >= BATCH_CHUNKS:
+                                chunks_added += _flush_batch(collection, pending_docs, pending_ids, pending_meta, written_ids)
+                                pending_docs, pending_ids, pending_meta = [], [], []
                     
-            except Exception as e:
-                print(f"⚠️  Failed to index {file_path}: {e}")
-                continue
+                    # Progress update every 50 files
+                    files_done += 1
+                    if files_done % 50 == 0 or files_done == file_count:
+                        progress = (files_done / file_count) * 100
+                        print(f"Progress: {progress:5.1f}% | Files: {files_processed:,}/{file_count:,} | Chunks: {chunks_added:,}")
+        
+        chunks_added += _flush_batch(collection, pending_docs, pending_ids, pending_meta, written_ids)
+        _print_warnings(index_warnings)
+        
+        # Only files whose new chunks were all stored count as indexed; their
+        # chunks that were not written again are gone from the file
+        indexed_times = {}
+        stale_ids = []
+        for rel_path, (mtime, chunk_ids) in file_chunk_ids.items():
+            if written_ids.issuperset(chunk_ids):
+                indexed_times[rel_path] = mtime
+                kept_ids = set(chunk_ids)
+                stale_ids.extend(chunk_id for chunk_id in stored_ids.get(rel_path, ()) if chunk_id not in kept_ids)
+        for start in range(0, len(stale_ids), BATCH_CHUNKS):
+            collection.delete(ids=stale_ids[start:start + BATCH_CHUNKS])
+        
+        # Keep the server's modification-check sidecar in step with the collection
+        try:
+            update_file_mtimes("./chroma_db", collection_name, root_str, indexed_times)
+        except OSError as e:
+            print(f"⚠️  Could not update file mtimes: {e}")
         
         print("\n✅ Indexing complete!")
         print(f"📊 Indexed {files_processed:,} files with {chunks_added:,} chunks")
@@ -425,6 +574,7 @@ def delete_collection(collection_info, index):
         try:
             client = get_client()
             client.delete_collection(name)
+            remove_file_mtimes("./chroma_db", name)
             print(f"✅ Successfully deleted collection '{name}'")
         except Exception as e:
             print(f"❌ Failed to delete collection: {e}")
@@ -437,6 +587,10 @@ def main():
     print("SEMANTIC SEARCH MCP")
     print("------------------")
     
+    # Collections are only re-read from Chroma after commands that change them
+    collection_info = []
+    needs_refresh = True
+    
     while True:
         # Check if chroma_db exists (relative to this script)
         script_dir = Path(__file__).parent
@@ -444,16 +598,21 @@ def main():
         
         if chroma_path.exists():
             print("\nIndexed projects:")
-            collection_info = list_collections()
+            if needs_refresh:
+                collection_info = list_collections()
+                needs_refresh = False
+            else:
+                print_collections(collection_info)
             
             if not collection_info:
                 print("📭 No collections found.")
             
-            print("\nOptions: delete <nr>, info <nr>, json <nr>, investigate <path>, add <path>, json <path>, exit")
+            print("\nOptions: delete <nr>, info <nr>, json <nr>, investigate <path>, add <path>, json <path>, refresh, exit")
         else:
             print("\n📭 No indexed data found.")
             print("\nOptions: investigate <path>, add <path>, json <path>, exit")
             collection_info = []
+            needs_refresh = True
         
         try:
             command = input("\n> ").strip()
@@ -464,10 +623,13 @@ def main():
         if command.lower() == 'exit':
             print("👋 Goodbye!")
             break
+        elif command.lower() == 'refresh':
+            needs_refresh = True
         elif command.lower().startswith('delete '):
             try:
                 index = int(command.split()[1])
                 delete_collection(collection_info, index)
+                needs_refresh = True
             except (ValueError, IndexError):
                 print("❌ Usage: delete <number>")
         elif command.lower().startswith('info '):
@@ -490,6 +652,7 @@ def main():
                 path = ' '.join(command.split()[1:])  # Handle paths with spaces
                 if path:
                     add_workspace(path)
+                    needs_refresh = True
                 else:
                     print("❌ Usage: add <workspace_path>")
             except Exception as e:
@@ -513,7 +676,7 @@ def main():
             except Exception as e:
                 print(f"❌ Error: {e}")
         else:
-            print("❌ Commands: delete <nr>, info <nr>, json <nr>/<path>, investigate <path>, add <path>, exit")
+            print("❌ Commands: delete <nr>, info <nr>, json <nr>/<path>, investigate <path>, add <path>, refresh, exit")
 
 
 if __name__ == "__main__":
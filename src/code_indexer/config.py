@@ -1,174 +1,222 @@
 """Configuration management with Pydantic v2."""
 
+import os
+import stat
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Set, Optional
-from pydantic import BaseModel, Field, ConfigDict, field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import FrozenSet, Optional, Protocol
 
 
-class IndexingConfig(BaseModel):
+# Defaults are shared frozensets so IndexingConfig() doesn't rebuild them
+_DEFAULT_ALLOWED_EXTENSIONS: FrozenSet[str] = frozenset({
+    # Programming languages
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.h', '.hpp', 
+    '.go', '.rs', '.rb', '.php', '.swift', '.kt', '.scala', '.cs', '.fs',
+    '.sh', '.bash', '.zsh', '.fish', '.ps1', '.bat', '.cmd',
+    # Web technologies  
+    '.html', '.htm', '.css', '.scss', '.sass', '.less',
+    # Data formats
+    '.json', '.yaml', '.yml', '.toml', '.xml', '.csv', '.tsv',
+    # Documentation
+    '.md', '.rst', '.txt', '.adoc',
+    # Configuration
+    '.ini', '.conf', '.cfg', '.env.example', '.gitignore', '.editorconfig'
+})
+
+_DEFAULT_IGNORE_PATTERNS: FrozenSet[str] = frozenset({
+    # Virtual environments
+    'venv', '.venv', 'env', '.env', 'virtualenv',
+    # Package managers
+    'node_modules', '__pycache__', '.pytest_cache',
+    # Version control
+    '.git', '.svn', '.hg',
+    # Build artifacts  
+    'build', 'dist', 'target', '.next', '.nuxt',
+    # IDE/editor files
+    '.vscode', '.idea', '*.swp', '*.swo',
+    # Cache directories
+    'cache', '.cache', '.npm', '.yarn',
+    # Static files (Django)
+    'staticfiles', 'static/admin', 'collectstatic',
+    # Logs
+    '*.log', 'logs',
+    # Temporary files
+    'tmp', 'temp', '.tmp',
+    # Hidden/config directories (anything starting with dot)
+    '.*'
+})
+
+
+# Chunks per collection.upsert() call when the server indexes files
+DEFAULT_INDEX_BATCH_SIZE = 128
+
+
+def _normalize_extensions(extensions: FrozenSet[str]) -> FrozenSet[str]:
+    """Ensure all extensions start with a dot and are lowercase."""
+    if extensions is _DEFAULT_ALLOWED_EXTENSIONS:
+        return extensions
+    validated = set()
+    for ext in extensions:
+        ext = ext.strip()
+        if not ext.startswith('.'):
+            ext = f'.{ext}'
+        validated.add(ext.lower())
+    return frozenset(validated)
+
+
+@dataclass(frozen=True, slots=True)
+class IndexingConfig:
     """Configuration for indexing behavior."""
     
-    model_config = ConfigDict(
-        frozen=True,
-        validate_assignment=True,
-        str_strip_whitespace=True
-    )
-    
-    max_file_size: int = Field(
-        default=1024 * 1024,  # 1MB
-        gt=0,
-        description="Maximum file size to index in bytes"
-    )
-    
-    modification_check_interval: int = Field(
-        default=0,  # 0 = check every search, N = check every N minutes
-        ge=0,
-        description="How often to check for file modifications in minutes (0 = every search, N = every N minutes)"
-    )
-    
-    allowed_extensions: Set[str] = Field(
-        default_factory=lambda: {
-            # Programming languages
-            '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.h', '.hpp', 
-            '.go', '.rs', '.rb', '.php', '.swift', '.kt', '.scala', '.cs', '.fs',
-            '.sh', '.bash', '.zsh', '.fish', '.ps1', '.bat', '.cmd',
-            # Web technologies  
-            '.html', '.htm', '.css', '.scss', '.sass', '.less',
-            # Data formats
-            '.json', '.yaml', '.yml', '.toml', '.xml', '.csv', '.tsv',
-            # Documentation
-            '.md', '.rst', '.txt', '.adoc',
-            # Configuration
-            '.ini', '.conf', '.cfg', '.env.example', '.gitignore', '.editorconfig'
-        },
-        description="File extensions to index"
-    )
-    
-    ignore_patterns: Set[str] = Field(
-        default_factory=lambda: {
-            # Virtual environments
-            'venv', '.venv', 'env', '.env', 'virtualenv',
-            # Package managers
-            'node_modules', '__pycache__', '.pytest_cache',
-            # Version control
-            '.git', '.svn', '.hg',
-            # Build artifacts  
-            'build', 'dist', 'target', '.next', '.nuxt',
-            # IDE/editor files
-            '.vscode', '.idea', '*.swp', '*.swo',
-            # Cache directories
-            'cache', '.cache', '.npm', '.yarn',
-            # Static files (Django)
-            'staticfiles', 'static/admin', 'collectstatic',
-            # Logs
-            '*.log', 'logs',
-            # Temporary files
-            'tmp', 'temp', '.tmp',
-            # Hidden/config directories (anything starting with dot)
-            '.*'
-        },
-        description="Patterns to ignore during indexing"
-    )
-    
-    @field_validator('allowed_extensions')
-    @classmethod
-    def validate_extensions(cls, v: Set[str]) -> Set[str]:
-        """Ensure all extensions start with a dot."""
-        validated = set()
-        for ext in v:
-            if not ext.startswith('.'):
-                ext = f'.{ext}'
-            validated.add(ext.lower())
-        return validated
-
-
-class ChromaDBConfig(BaseModel):
+    # Maximum file size to index in bytes (1MB)
+    max_file_size: int = 1024 * 1024
+    
+    # How often to check for file modifications in minutes (0 = every search, N = every N minutes)
+    modification_check_interval: int = 0
+    
+    # File extensions to index
+    allowed_extensions: FrozenSet[str] = _DEFAULT_ALLOWED_EXTENSIONS
+    
+    # Patterns to ignore during indexing
+    ignore_patterns: FrozenSet[str] = _DEFAULT_IGNORE_PATTERNS
+    
+    def __post_init__(self) -> None:
+        """Validate limits and normalize the extension and pattern sets."""
+        if self.max_file_size <= 0:
+            raise ValueError("max_file_size must be greater than 0")
+        if self.modification_check_interval < 0:
+            raise ValueError("modification_check_interval must be 0 or greater")
+        
+        # Frozen dataclass, so normalized values are set through object.__setattr__
+        object.__setattr__(self, 'allowed_extensions', _normalize_extensions(self.allowed_extensions))
+        if self.ignore_patterns is not _DEFAULT_IGNORE_PATTERNS:
+            object.__setattr__(self, 'ignore_patterns', frozenset(p.strip() for p in self.ignore_patterns))
+
+
+@dataclass(frozen=True, slots=True)
+class ChromaDBConfig:
     """Configuration for ChromaDB connection."""
     
-    model_config = ConfigDict(
-        frozen=True,
-        validate_assignment=True
-    )
-    
-    database_path: Path = Field(
-        default=Path("./chroma_db"),
-        description="Path to ChromaDB storage directory"
-    )
-    
-    anonymized_telemetry: bool = Field(
-        default=False,
-        description="Whether to enable ChromaDB telemetry"
-    )
-    
-    similarity_metric: str = Field(
-        default="cosine",
-        description="Similarity metric for vector search"
-    )
-    
-    @field_validator('database_path')
-    @classmethod
-    def ensure_path_exists(cls, v: Path) -> Path:
-        """Ensure database directory exists."""
-        v.mkdir(parents=True, exist_ok=True)
-        return v
-
-
-class SemanticSearchConfig(BaseSettings):
-    """Main configuration for semantic search MCP server."""
-    
-    model_config = SettingsConfigDict(
-        case_sensitive=False,
-        validate_assignment=True
-    )
-    
-    workspace_path: str = Field(
-        description="Absolute path to workspace directory to index"
-    )
-    
-    indexing: IndexingConfig = Field(
-        default_factory=IndexingConfig,
-        description="Indexing behavior configuration"
-    )
-    
-    chromadb: ChromaDBConfig = Field(
-        default_factory=ChromaDBConfig,
-        description="ChromaDB connection configuration"
-    )
-    
-    @field_validator('workspace_path')
-    @classmethod
-    def validate_workspace_path(cls, v: str) -> str:
-        """Validate workspace path exists and is directory."""
-        if not v:
-            raise ValueError("Workspace path is required")
+    # Path to ChromaDB storage directory
+    database_path: Path = Path("./chroma_db")
+    
+    # Whether to enable ChromaDB telemetry
+    anonymized_telemetry: bool = False
+    
+    # Similarity metric for vector search
+    similarity_metric: str = "cosine"
+    
+    def __post_init__(self) -> None:
+        """Coerce database_path to a Path (no filesystem access here)."""
+        object.__setattr__(self, 'database_path', Path(self.database_path))
+    
+    def ensure_ready(self) -> None:
+        """Ensure database directory exists; call before opening ChromaDB."""
+        self.database_path.mkdir(parents=True, exist_ok=True)
+
+
+class WorkspaceSettings(Protocol):
+    """Fields of SemanticSearchConfig, for typing without importing pydantic-settings."""
+    
+    workspace_path: str
+    indexing: IndexingConfig
+    chromadb: ChromaDBConfig
+    index_batch_size: int
+
+
+@lru_cache(maxsize=1)
+def _settings_class() -> type:
+    """Build the SemanticSearchConfig settings class on first use.
+    
+    pydantic-settings is only imported once a workspace config is needed, so
+    callers that only use the defaults never load it.
+    """
+    from pydantic import Field, field_validator
+    from pydantic_settings import BaseSettings, SettingsConfigDict
+    
+    class SemanticSearchConfig(BaseSettings):
+        """Main configuration for semantic search MCP server."""
+        
+        model_config = SettingsConfigDict(
+            case_sensitive=False,
+            frozen=True
+        )
+        
+        workspace_path: str = Field(
+            description="Absolute path to workspace directory to index"
+        )
+        
+        indexing: IndexingConfig = Field(
+            default_factory=IndexingConfig,
+            description="Indexing behavior configuration"
+        )
         
-        path = Path(v)
-        if not path.exists():
-            raise ValueError(f"Workspace directory does not exist: {v}")
+        chromadb: ChromaDBConfig = Field(
+            default_factory=ChromaDBConfig,
+            description="ChromaDB connection configuration"
+        )
         
-        if not path.is_dir():
-            raise ValueError(f"Workspace path is not a directory: {v}")
+        index_batch_size: int = Field(
+            default=DEFAULT_INDEX_BATCH_SIZE,
+            gt=0,
+            description="Chunks per collection.upsert() call while indexing (env INDEX_BATCH_SIZE)"
+        )
         
-        return str(path.absolute())
+        @field_validator('workspace_path')
+        @classmethod
+        def validate_workspace_path(cls, v: str) -> str:
+            """Validate workspace path exists and is directory."""
+            if not v:
+                raise ValueError("Workspace path is required")
+            
+            # A single stat answers both "exists" and "is a directory"
+            try:
+                mode = os.stat(v).st_mode
+            except OSError:
+                raise ValueError(f"Workspace directory does not exist: {v}")
+            
+            if not stat.S_ISDIR(mode):
+                raise ValueError(f"Workspace path is not a directory: {v}")
+            
+            # Path.absolute() keeps '..' segments, unlike os.path.abspath; collection
+            # names hash this string, so normalizing it would orphan existing indexes
+            return str(Path(v).absolute())
+    
+    return SemanticSearchConfig
 
 
-# Global configuration instance
-config: Optional[SemanticSearchConfig] = None
+def __getattr__(name: str):
+    """Expose SemanticSearchConfig as a module attribute without importing pydantic-settings eagerly."""
+    if name == 'SemanticSearchConfig':
+        return _settings_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def get_config() -> SemanticSearchConfig:
-    """Get or create global configuration instance."""
-    global config
-    if config is None:
-        import os
-        workspace_path = os.environ.get('WORKSPACE_PATH')
-        if not workspace_path:
-            raise ValueError("WORKSPACE_PATH environment variable is required")
-        
-        config = SemanticSearchConfig(workspace_path=workspace_path)
+@lru_cache(maxsize=1)
+def get_config() -> WorkspaceSettings:
+    """Get configuration built from WORKSPACE_PATH (created once, see reset_config)."""
+    workspace_path = os.environ.get('WORKSPACE_PATH')
+    if not workspace_path:
+        raise ValueError("WORKSPACE_PATH environment variable is required")
     
-    return config
+    return _settings_class()(workspace_path=workspace_path)
+
+
+@lru_cache(maxsize=1)
+def _get_config_or_none() -> Optional[WorkspaceSettings]:
+    """Get configuration, or None if WORKSPACE_PATH is not available."""
+    try:
+        return get_config()
+    except ValueError:
+        return None
+
+
+def reset_config() -> None:
+    """Drop the cached configuration and accessor results (e.g. after changing WORKSPACE_PATH)."""
+    for cached in (get_config, _get_config_or_none, _resolved_indexing, _resolved_chromadb,
+                   get_modification_check_interval, get_index_batch_size):
+        cached.cache_clear()
 
 
 # Default configuration instances for standalone use
@@ -182,42 +230,68 @@ def get_default_chromadb_config() -> ChromaDBConfig:
     return ChromaDBConfig()
 
 
-def get_allowed_extensions() -> Set[str]:
-    """Get allowed file extensions from config, or defaults if WORKSPACE_PATH not available."""
-    try:
-        return get_config().indexing.allowed_extensions
-    except ValueError:
+@lru_cache(maxsize=1)
+def _resolved_indexing() -> IndexingConfig:
+    """Indexing config from WORKSPACE_PATH, or the defaults, resolved once."""
+    config = _get_config_or_none()
+    if config is None:
         # WORKSPACE_PATH not set, use defaults for management tool
-        return get_default_indexing_config().allowed_extensions
+        return get_default_indexing_config()
+    return config.indexing
 
 
-def get_ignore_patterns() -> Set[str]:
-    """Get ignore patterns from config, or defaults if WORKSPACE_PATH not available."""
-    try:
-        return get_config().indexing.ignore_patterns
-    except ValueError:
+@lru_cache(maxsize=1)
+def _resolved_chromadb() -> ChromaDBConfig:
+    """ChromaDB config from WORKSPACE_PATH, or the defaults, resolved once."""
+    config = _get_config_or_none()
+    if config is None:
         # WORKSPACE_PATH not set, use defaults for management tool
-        return get_default_indexing_config().ignore_patterns
+        return get_default_chromadb_config()
+    return config.chromadb
+
+
+def get_allowed_extensions() -> FrozenSet[str]:
+    """Get allowed file extensions from config, or defaults if WORKSPACE_PATH not available."""
+    return _resolved_indexing().allowed_extensions
+
+
+def is_allowed_extension(name: str) -> bool:
+    """Check a file name's extension against the allowlist without building a Path.
+    
+    Matches Path(name).suffix semantics, so file walkers can pass os.DirEntry.name
+    straight in instead of constructing Path objects.
+    """
+    i = name.rfind('.')
+    if not 0 < i < len(name) - 1:
+        return False
+    return name[i:].lower() in _resolved_indexing().allowed_extensions
+
+
+def get_ignore_patterns() -> FrozenSet[str]:
+    """Get ignore patterns from config, or defaults if WORKSPACE_PATH not available."""
+    return _resolved_indexing().ignore_patterns
 
 
 def get_max_file_size() -> int:
     """Get maximum file size from config, or defaults if WORKSPACE_PATH not available."""
-    try:
-        return get_config().indexing.max_file_size
-    except ValueError:
-        # WORKSPACE_PATH not set, use defaults for management tool
-        return get_default_indexing_config().max_file_size
+    return _resolved_indexing().max_file_size
 
 
+@lru_cache(maxsize=1)
 def get_modification_check_interval() -> int:
     """Get modification check interval from config."""
     return get_config().indexing.modification_check_interval
 
 
+@lru_cache(maxsize=1)
+def get_index_batch_size() -> int:
+    """Get indexing batch size from config, or the default if WORKSPACE_PATH not available."""
+    config = _get_config_or_none()
+    if config is None:
+        return DEFAULT_INDEX_BATCH_SIZE
+    return config.index_batch_size
+
+
 def get_chromadb_config() -> ChromaDBConfig:
     """Get ChromaDB configuration from config, or defaults if WORKSPACE_PATH not available.""" 
-    try:
-        return get_config().chromadb
-    except ValueError:
-        # WORKSPACE_PATH not set, use defaults for management tool
-        return get_default_chromadb_config()
\ No newline at end of file
+    return _resolved_chromadb()
\ No newline at end of file
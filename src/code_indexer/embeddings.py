@@ -0,0 +1,58 @@
+"""Batched local embedding of chunks before they are written to Chroma."""
+
+import logging
+from functools import lru_cache
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Same model as Chroma's default embedding function, so stored chunks and
+# queries embedded by Chroma share one vector space
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Chunks per forward pass of the embedding model
+EMBEDDING_BATCH_SIZE = 64
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model() -> Optional[Any]:
+    """Load the sentence-transformers model once, or None if it is not available.
+    
+    sentence-transformers is imported lazily so callers that never write
+    chunks don't pay for loading it; without it, Chroma embeds on write.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    
+    try:
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+    except Exception as e:
+        logger.warning("Could not load embedding model %s, falling back to Chroma's embedding function: %s",
+                       EMBEDDING_MODEL_NAME, e)
+        return None
+
+
+def embed_documents(documents: List[str]) -> Optional[Any]:
+    """Embed documents in batches of EMBEDDING_BATCH_SIZE.
+    
+    Returns:
+        A (len(documents), dim) array of normalized embeddings, or None when
+        no local model is available and Chroma should embed instead.
+    """
+    model = get_embedding_model()
+    if model is None or not documents:
+        return None
+    return model.encode(
+        documents,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+
+
+def embed_query(query: str) -> Optional[Any]:
+    """Embed one search query like the stored chunks, or None when no local model is available."""
+    embeddings = embed_documents([query])
+    return None if embeddings is None else embeddings[0]
@@ -0,0 +1,135 @@
+"""Per-collection sidecar of indexed file mtimes kept next to the Chroma database.
+
+Modification checks read {rel_path: mtime} from a small JSON file instead of
+pulling every chunk's metadata out of Chroma. Writers hold an exclusive
+flock so the server and the management tool can update it concurrently.
+Parsed sidecars are kept in memory until the file on disk changes.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, last writer wins
+    fcntl = None
+
+# Parsed sidecars by path, valid while the file's (inode, mtime_ns, size) is unchanged
+_cache: Dict[Path, Tuple[Tuple[int, int, int], Tuple[str, Dict[str, float]]]] = {}
+
+
+def sidecar_path(db_dir: Union[str, Path], collection_name: str) -> Path:
+    """Path of the mtime sidecar for a collection."""
+    return Path(db_dir) / f".file_mtimes.{collection_name}.json"
+
+
+@contextmanager
+def _locked(path: Path, lock_type: int) -> Iterator:
+    """Open path for read/write (creating it) and hold a flock of lock_type on it."""
+    with open(path, 'a+', encoding='utf-8') as f:
+        if fcntl is not None:
+            fcntl.flock(f, lock_type)
+        try:
+            f.seek(0)
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _parse(text: str) -> Optional[Tuple[str, Dict[str, float]]]:
+    """Parse sidecar JSON into (collection_root, files), or None if empty or malformed."""
+    if not text.strip():
+        return None
+    try:
+        data = json.loads(text)
+        return str(data['collection_root']), {str(k): float(v) for k, v in data['files'].items()}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _cached(path: Path, key: Tuple[int, int, int]) -> Optional[Tuple[str, Dict[str, float]]]:
+    """Copy of the cached sidecar for path if it was cached under key."""
+    entry = _cache.get(path)
+    if entry is None or entry[0] != key:
+        return None
+    collection_root, files = entry[1]
+    return collection_root, dict(files)
+
+
+def load_file_mtimes(db_dir: Union[str, Path], collection_name: str) -> Optional[Tuple[str, Dict[str, float]]]:
+    """Load (collection_root, {rel_path: mtime}) for a collection, or None if there is no usable sidecar.
+    
+    The file is only read and parsed again when its stat changes, e.g. after
+    another process updated it.
+    """
+    path = sidecar_path(db_dir, collection_name)
+    try:
+        cached = _cached(path, _stat_key(path.stat()))
+    except FileNotFoundError:
+        _cache.pop(path, None)
+        return None
+    if cached is not None:
+        return cached
+    
+    with _locked(path, fcntl.LOCK_SH if fcntl else 0) as f:
+        parsed = _parse(f.read())
+        # Writers hold LOCK_EX, so this stat matches the content just read
+        key = _stat_key(os.fstat(f.fileno()))
+    if parsed is None:
+        _cache.pop(path, None)
+        return None
+    _cache[path] = (key, parsed)
+    return _cached(path, key)
+
+
+def sidecar_version(db_dir: Union[str, Path], collection_name: str) -> Optional[Tuple[int, int, int]]:
+    """Stat signature of a collection's sidecar, or None if there is none.
+    
+    Every writer updates the sidecar, so a changed signature means the
+    collection may have changed, possibly in another process.
+    """
+    try:
+        return _stat_key(sidecar_path(db_dir, collection_name).stat())
+    except OSError:
+        return None
+
+
+def update_file_mtimes(db_dir: Union[str, Path], collection_name: str, collection_root: Union[str, Path],
+                       updated: Dict[str, float], removed: Iterable[str] = (), replace: bool = False) -> None:
+    """Merge updated mtimes into a collection's sidecar and drop removed paths.
+    
+    With replace=True the existing entries are discarded first (e.g. after a
+    full re-index).
+    """
+    path = sidecar_path(db_dir, collection_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _locked(path, fcntl.LOCK_EX if fcntl else 0) as f:
+        existing = None if replace else _parse(f.read())
+        files = existing[1] if existing else {}
+        files.update(updated)
+        for rel_path in removed:
+            files.pop(rel_path, None)
+        
+        f.seek(0)
+        f.truncate()
+        json.dump({'collection_root': str(collection_root), 'files': files}, f)
+        f.flush()
+        _cache[path] = (_stat_key(os.fstat(f.fileno())), (str(collection_root), files))
+
+
+def remove_file_mtimes(db_dir: Union[str, Path], collection_name: str) -> None:
+    """Delete a collection's sidecar, e.g. when the collection itself is deleted."""
+    path = sidecar_path(db_dir, collection_name)
+    _cache.pop(path, None)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,109 @@
+"""In-process semantic cache for search results, keyed by query embedding."""
+
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+# Cosine similarity at or above which a cached query counts as the same query
+DEFAULT_SIMILARITY_THRESHOLD = 0.97
+
+# Cached queries kept per collection before least recently used ones are evicted
+DEFAULT_CACHE_CAPACITY = 128
+
+# Queries starting or ending with this word skip the cache and always hit the collection
+NO_CACHE_MARKER = "no-cache"
+
+
+class SemanticQueryCache:
+    """LRU cache of query results looked up by cosine similarity of query embeddings.
+    
+    Embeddings are L2-normalized and stored as rows of one matrix, so a lookup
+    is a single matrix-vector product over the cached queries.
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_CACHE_CAPACITY,
+                 threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than 0")
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None  # (capacity, dim), allocated on first put
+        self._values: List[Any] = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._vectors = None
+        self._values = [None] * self.capacity
+        self._last_used[:] = 0
+        self._size = 0
+    
+    def get(self, embedding: Any) -> Optional[Any]:
+        """Return the value cached for the most similar query, or None below the threshold."""
+        query = _normalize(embedding)
+        if self._size == 0 or self._vectors is None or query.shape[0] != self._vectors.shape[1]:
+            return None
+        
+        similarities = self._vectors[:self._size] @ query
+        slot = int(np.argmax(similarities))
+        if similarities[slot] < self.threshold:
+            return None
+        
+        self._touch(slot)
+        return self._values[slot]
+    
+    def put(self, embedding: Any, value: Any) -> None:
+        """Cache value for a query embedding, evicting the least recently used entry when full."""
+        vector = _normalize(embedding)
+        if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            # First entry, or the embedding model changed: start over at the new dimension
+            self.clear()
+            self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        
+        self._vectors[slot] = vector
+        self._values[slot] = value
+        self._touch(slot)
+    
+    def _touch(self, slot: int) -> None:
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+
+def _normalize(embedding: Any) -> np.ndarray:
+    """Convert an embedding to a unit-length float32 vector."""
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def strip_no_cache_marker(query: str) -> Tuple[str, bool]:
+    """Remove NO_CACHE_MARKER from a query that starts or ends with it as a separate word.
+    
+    Anywhere else (e.g. "where do we set no-cache headers") the marker is part
+    of the search terms, and the query is returned unchanged.
+    
+    Returns:
+        (query without the marker, whether the cache should be bypassed)
+    """
+    if NO_CACHE_MARKER not in query:
+        return query, False
+    
+    words = query.split()
+    if NO_CACHE_MARKER not in (words[0], words[-1]):
+        return query, False
+    if words[0] == NO_CACHE_MARKER:
+        words = words[1:]
+    if words and words[-1] == NO_CACHE_MARKER:
+        words = words[:-1]
+    return " ".join(words), True
@@ -2,11 +2,14 @@
 
 import logging
 import asyncio
+import io
 import os
+import sqlite3
+import stat
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Iterable, Set
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
@@ -15,18 +18,29 @@ import chromadb
 from chromadb.config import Settings as ChromaSettings
 
 from .utils import (
+    enable_wal_mode,
     generate_collection_name,
-    is_file_indexable,
+    iter_files,
+    load_file_chunks,
+    load_file_chunks_batch,
+    create_file_executor,
     create_chunk_metadata,
-    generate_chunk_id
+    generate_chunk_id,
+    diff_file_mtimes,
+    compile_ignore_patterns
 )
 from .config import (
-    get_allowed_extensions,
+    is_allowed_extension,
     get_ignore_patterns, 
     get_max_file_size,
     get_modification_check_interval,
+    get_index_batch_size,
     get_chromadb_config
 )
+from .query_cache import SemanticQueryCache, strip_no_cache_marker
+from .file_mtimes import load_file_mtimes, update_file_mtimes, sidecar_version
+from .embeddings import embed_documents, embed_query
+from .watcher import WorkspaceWatcher
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -81,7 +95,7 @@ def get_workspace_info() -> Tuple[str, str]:
     # Generate collection name using shared utility
     collection_name = generate_collection_name(workspace_path)
     
-    logger.info(f"Using explicit workspace: {workspace_path} -> collection: {collection_name}")
+    logger.info("Using explicit workspace: %s -> collection: %s", workspace_path, collection_name)
     return str(workspace_dir.absolute()), collection_name
 
 
@@ -89,7 +103,7 @@ def get_workspace_info() -> Tuple[str, str]:
 @server.call_tool()
 async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls.""" 
-    logger.info(f"🔧 Tool called: {name} with args: {arguments}")
+    logger.info("🔧 Tool called: %s with args: %s", name, arguments)
     
     if name == "semantic_search":
         query = arguments.get("query", "")
@@ -105,12 +119,13 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
 
 async def handle_semantic_search(query: str) -> str:
     """Smart semantic search with auto-indexing and modification detection."""
-    logger.info(f"🧠 Semantic search: '{query}'")
+    logger.info("🧠 Semantic search: '%s'", query)
+    query, bypass_cache = strip_no_cache_marker(query)
     
     try:
         # Get workspace from environment
         workspace_path, collection_name = get_workspace_info()
-        logger.info(f"📁 Using workspace: {workspace_path} → collection: {collection_name}")
+        logger.info("📁 Using workspace: %s → collection: %s", workspace_path, collection_name)
         
         dir_path = Path(workspace_path)
         if not dir_path.exists():
@@ -121,13 +136,13 @@ async def handle_semantic_search(query: str) -> str:
         # Check if collection exists
         try:
             collection = client.get_collection(collection_name)
-            logger.info(f"📚 Found existing collection '{collection_name}' with {collection.count()} chunks")
+            logger.info("📚 Found existing collection '%s' with %d chunks", collection_name, collection.count())
             
             # Check for modified files and re-index if needed
             await check_and_update_collection(collection, collection_name)
             
         except NotFoundError:
-            logger.info(f"📁 Collection '{collection_name}' not found, auto-indexing directory...")
+            logger.info("📁 Collection '%s' not found, auto-indexing directory...", collection_name)
             
             # Auto-index the directory
             index_result = await handle_index_directory(workspace_path, collection_name)
@@ -142,19 +157,18 @@ async def handle_semantic_search(query: str) -> str:
             
             # Get the newly created collection
             collection = client.get_collection(collection_name)
-            logger.info(f"✅ Auto-indexed and created collection '{collection_name}'")
+            logger.info("✅ Auto-indexed and created collection '%s'", collection_name)
         
         # Perform the search
-        results = collection.query(
-            query_texts=[query],
-            n_results=5
-        )
+        results = _query_collection(collection, collection_name, query, use_cache=not bypass_cache)
         
         if (results['documents'] and results['documents'][0] and 
             results['metadatas'] and results['metadatas'][0] and
             results['distances'] and results['distances'][0]):
             
-            response_parts = [f"🎯 Found {len(results['documents'][0])} results for '{query}':\n"]
+            # Written straight into one buffer instead of joining a list of parts
+            response = io.StringIO()
+            response.write(f"🎯 Found {len(results['documents'][0])} results for '{query}':\n")
             
             for i, (doc, metadata, distance) in enumerate(zip(
                 results['documents'][0],
@@ -164,10 +178,10 @@ async def handle_semantic_search(query: str) -> str:
                 similarity = round((1 - distance) * 100, 1)
                 file_path = metadata.get('file_path', 'unknown') if metadata else 'unknown'
                 
-                response_parts.append(f"\n📄 Result {i+1} ({similarity}% match) - {file_path}:")
-                response_parts.append(f"```\n{doc}\n```")
+                response.write(f"\n\n📄 Result {i+1} ({similarity}% match) - {file_path}:")
+                response.write(f"\n```\n{doc}\n```")
                 
-            return "\n".join(response_parts)
+            return response.getvalue()
         else:
             # No results found - show helpful message with available collections
             collections = client.list_collections()
@@ -176,7 +190,7 @@ async def handle_semantic_search(query: str) -> str:
             return f"❌ No matches found for '{query}' in collection '{collection_name}'\n\n📚 Available collections:\n" + "\n".join(available)
             
     except Exception as e:
-        logger.error(f"Semantic search error: {e}")
+        logger.error("Semantic search error: %s", e)
         return f"❌ Search failed: {str(e)}"
 
 
@@ -186,23 +200,105 @@ _chroma_client = None
 # Modification check cache to avoid excessive filesystem checks
 _last_modification_check = {}
 
+# One modification check at a time per collection
+_check_locks: Dict[str, asyncio.Lock] = {}
+
+# Filesystem watchers per collection; None where watching is unavailable
+_watchers: Dict[str, Optional[WorkspaceWatcher]] = {}
+
+# Semantic query caches per collection with the sidecar version they were
+# created under, dropped whenever the collection changes
+_query_caches: Dict[str, Tuple[Optional[Tuple[int, int, int]], SemanticQueryCache]] = {}
+
 def get_chroma_client() -> chromadb.ClientAPI:
     """Get or create global persistent ChromaDB client."""
     global _chroma_client
     if _chroma_client is None:
         chroma_config = get_chromadb_config()
+        chroma_config.ensure_ready()
+        try:
+            enable_wal_mode(chroma_config.database_path)
+        except sqlite3.Error as e:
+            logger.warning("Could not enable WAL mode: %s", e)
         _chroma_client = chromadb.PersistentClient(
             path=str(chroma_config.database_path),
             settings=ChromaSettings(anonymized_telemetry=chroma_config.anonymized_telemetry)
         )
-        logger.info(f"📚 Created persistent ChromaDB client at {chroma_config.database_path}")
+        logger.info("📚 Created persistent ChromaDB client at %s", chroma_config.database_path)
     return _chroma_client
 
 
 
+def _query_collection(collection, collection_name: str, query: str, use_cache: bool = True) -> Dict[str, Any]:
+    """Query the collection, answering near-duplicate queries from the semantic cache.
+    
+    The query is embedded once with the same local model as the stored chunks;
+    on a cache miss that embedding is passed to Chroma so it is not embedded
+    again. Without a local model Chroma embeds the query and nothing is cached.
+    """
+    embedding = embed_query(query) if use_cache else None
+    if embedding is None:
+        return collection.query(query_texts=[query], n_results=5)
+    
+    cache = _get_query_cache(collection_name)
+    results = cache.get(embedding)
+    if results is not None:
+        logger.info("♻️  Semantic cache hit for '%s'", query)
+        return results
+    
+    results = collection.query(query_embeddings=[embedding], n_results=5)
+    cache.put(embedding, results)
+    return results
+
+
+def _get_query_cache(collection_name: str) -> SemanticQueryCache:
+    """Semantic cache for a collection, started over when its sidecar changed.
+    
+    manage.py writes chunks from another process and updates the sidecar, so
+    a changed sidecar means cached results may be stale.
+    """
+    version = sidecar_version(get_chromadb_config().database_path, collection_name)
+    entry = _query_caches.get(collection_name)
+    if entry is None or entry[0] != version:
+        entry = (version, SemanticQueryCache())
+        _query_caches[collection_name] = entry
+    return entry[1]
+
+
+def _invalidate_query_cache(collection_name: str) -> None:
+    """Drop cached search results for a collection after its contents change."""
+    _query_caches.pop(collection_name, None)
+
+
+def _flush_chunks(collection, documents: List[str], ids: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+    """Upsert buffered chunks in a single call, clear the buffers and return the IDs that were stored."""
+    if not ids:
+        return []
+    
+    written = list(ids)
+    try:
+        # Embedded here in model-sized batches; None lets Chroma embed on write instead
+        embeddings = embed_documents(documents)
+        # Content-hash IDs make re-indexing idempotent: same content, same ID
+        collection.upsert(
+            documents=documents,
+            embeddings=embeddings,
+            ids=ids,
+            metadatas=metadatas
+        )
+    except Exception as e:
+        logger.warning("Failed to add batch of %d chunks: %s", len(ids), e)
+        written = []
+    
+    documents.clear()
+    ids.clear()
+    metadatas.clear()
+    return written
+
+
 async def handle_index_directory(directory_path: str, collection_name: str) -> str:
     """Index a directory of code files."""
-    logger.info(f"📁 Indexing directory: {directory_path}")
+    logger.info("📁 Indexing directory: %s", directory_path)
     
     try:
         
@@ -217,85 +313,134 @@ async def handle_index_directory(directory_path: str, collection_name: str) -> s
         )
         
         # Get shared configuration
-        allowed_extensions = get_allowed_extensions()
         ignore_patterns = get_ignore_patterns()
+        max_file_size = get_max_file_size()
+        batch_size = get_index_batch_size()
         
         files_processed = 0
-        chunks_added = 0
+        # A fresh collection replaces any sidecar left behind by a deleted one
+        is_new_collection = collection.count() == 0
+        file_chunk_ids = {}
+        written_ids = set()
         
-        for file_path in dir_path.rglob("*"):
-            indexable, reason = is_file_indexable(file_path, allowed_extensions, ignore_patterns, get_max_file_size())
-            if not indexable:
-                if "file too large" in reason:
-                    logger.warning(f"Skipping file: {file_path} - {reason}")
-                continue
-                
-            try:
-                content = file_path.read_text(encoding='utf-8', errors='ignore')
-                
-                # Simple chunking - split on double newlines
-                chunks = [chunk.strip() for chunk in content.split('\n\n') if chunk.strip()]
-                
-                if chunks:
-                    current_time = time.time()
-                    
-                    ids = [generate_chunk_id(file_path, i, current_time) for i in range(len(chunks))]
-                    metadatas = [
-                        create_chunk_metadata(file_path, dir_path, i) for i in range(len(chunks))
-                    ]
-                    
-                    collection.add(
-                        documents=chunks,
-                        ids=ids,
-                        metadatas=metadatas
-                    )
-                    
-                    chunks_added += len(chunks)
-                    files_processed += 1
+        # Chunks are buffered and added in batches of batch_size
+        documents, ids, metadatas = [], [], []
+        
+        # iter_files prunes ignored directories instead of walking into them
+        file_paths = [
+            entry.path
+            for entry in iter_files(dir_path, ignore_patterns)
+            if is_allowed_extension(entry.name)
+        ]
+        
+        # Reads, chunking and hashing run on worker threads; embedding and Chroma
+        # writes stay on the event loop. No process pool here: spawned workers
+        # would share stdout, which carries the MCP protocol
+        loop = asyncio.get_running_loop()
+        executor, files_per_task = create_file_executor(len(file_paths))
+        with executor:
+            futures = [
+                loop.run_in_executor(executor, load_file_chunks_batch, file_paths[i:i + files_per_task], max_file_size)
+                for i in range(0, len(file_paths), files_per_task)
+            ]
+            
+            for next_results in asyncio.as_completed(futures):
+                for file_path, hashed_chunks, reason, mtime in await next_results:
+                    if hashed_chunks is None:
+                        if "file too large" in reason:
+                            logger.warning("Skipping file: %s - %s", file_path, reason)
+                        elif reason.startswith("read error"):
+                            logger.warning("Failed to index %s: %s", file_path, reason)
+                        continue
                     
-            except Exception as e:
-                logger.warning(f"Failed to index {file_path}: {e}")
-                continue
+                    rel_path = str(file_path.relative_to(dir_path))
+                    chunk_ids = [generate_chunk_id(rel_path, content_hash) for _, _, content_hash in hashed_chunks]
+                    file_chunk_ids[rel_path] = (mtime, chunk_ids)
+                    if hashed_chunks:
+                        for (i, chunk, content_hash), chunk_id in zip(hashed_chunks, chunk_ids):
+                            ids.append(chunk_id)
+                            metadatas.append(create_chunk_metadata(file_path, dir_path, i, mtime, content_hash))
+                            documents.append(chunk)
+                        files_processed += 1
+                        
+                        if len(ids) >= batch_size:
+                            written_ids.update(_flush_chunks(collection, documents, ids, metadatas))
         
-        return f"✅ Indexed {files_processed} files, {chunks_added} chunks in collection '{collection_name}'"
+        written_ids.update(_flush_chunks(collection, documents, ids, metadatas))
+        _invalidate_query_cache(collection_name)
+        # Files with chunks that failed to store are left out, so the next check retries them
+        file_mtimes = {
+            rel_path: mtime
+            for rel_path, (mtime, chunk_ids) in file_chunk_ids.items()
+            if written_ids.issuperset(chunk_ids)
+        }
+        _save_file_mtimes(collection_name, dir_path, file_mtimes, replace=is_new_collection)
+        
+        return f"✅ Indexed {files_processed} files, {len(written_ids)} chunks in collection '{collection_name}'"
         
     except Exception as e:
-        logger.error(f"Indexing error: {e}")
+        logger.error("Indexing error: %s", e)
         return f"❌ Indexing failed: {str(e)}"
 
 
 
 
 async def check_and_update_collection(collection, collection_name: str) -> None:
-    """Check for modified files and update collection if needed."""
+    """Check for modified files and update collection if needed.
+    
+    Concurrent callers for the same collection wait on a per-collection lock;
+    the check time is recorded before the work starts, so whoever gets the
+    lock next sees the fresh check and returns without touching Chroma.
+    """
     if not _should_check_modifications(collection_name):
         return
-        
-    try:
-        logger.info(f"🔍 Checking for file modifications in collection '{collection_name}'")
-        _last_modification_check[collection_name] = time.time()
-        
-        # Get collection metadata
-        all_metadata = collection.get()['metadatas']
-        if not all_metadata:
-            logger.debug(f"No metadata found in collection '{collection_name}'")
-            return
-        
-        workspace_dir = _get_workspace_from_metadata(all_metadata)
-        if not workspace_dir:
-            logger.warning("Could not determine workspace directory from metadata")
+    
+    lock = _check_locks.setdefault(collection_name, asyncio.Lock())
+    async with lock:
+        if not _should_check_modifications(collection_name):
             return
+        _last_modification_check[collection_name] = time.time()
         
-        # Find new, modified, and deleted files
-        new_files = _find_new_files(all_metadata, workspace_dir)
-        files_to_reindex = _find_modified_files(all_metadata)
-        deleted_files = _find_deleted_files(all_metadata, workspace_dir)
-        
-        # Process updates
-        await _process_file_updates(collection, files_to_reindex, new_files, deleted_files, workspace_dir, collection_name)
-        
-    except Exception as e:
-        logger.warning(f"File check error: {e}")
+        watcher = None
+        try:
+            logger.info("🔍 Checking for file modifications in collection '%s'", collection_name)
+            
+            # Indexed file mtimes come from the sidecar; chunk metadata is the fallback
+            sidecar = _load_file_mtimes(collection_name)
+            if sidecar is not None:
+                collection_root, indexed = sidecar
+                workspace_dir = Path(collection_root)
+            else:
+                all_metadata = collection.get(include=["metadatas"])['metadatas']
+                if not all_metadata:
+                    logger.debug("No metadata found in collection '%s'", collection_name)
+                    return
+                
+                workspace_dir = _get_workspace_from_metadata(all_metadata)
+                if not workspace_dir:
+                    logger.warning("Could not determine workspace directory from metadata")
+                    return
+                
+                indexed = _indexed_file_mtimes(all_metadata)
+                _save_file_mtimes(collection_name, workspace_dir, indexed, replace=True)
+            
+            # Only files the watcher saw change need a look; otherwise walk the workspace once
+            watcher = _get_watcher(collection_name, workspace_dir)
+            changed = watcher.drain() if watcher else None
+            new_files, files_to_reindex, deleted_files = _diff_workspace(indexed, workspace_dir, changed)
+            
+            # Process updates
+            stored = await _process_file_updates(collection, files_to_reindex, new_files, deleted_files,
+                                                 workspace_dir, collection_name)
+            if not stored and watcher is not None:
+                # Files that failed to store only come back through a full walk
+                watcher.request_full_scan()
+            
+        except Exception as e:
+            logger.warning("File check error: %s", e)
+            if watcher is not None:
+                # The drained changes may not have been applied
+                watcher.request_full_scan()
 
 
 def _should_check_modifications(collection_name: str) -> bool:
@@ -312,7 +457,8 @@ def _should_check_modifications(collection_name: str) -> bool:
     interval_seconds = check_interval_minutes * 60  # Convert minutes to seconds
     
     if current_time - last_check_time < interval_seconds:
-        logger.debug(f"Skipping modification check for '{collection_name}' (checked {(current_time - last_check_time)/60:.1f} minutes ago, interval: {check_interval_minutes}m)")
+        logger.debug("Skipping modification check for '%s' (checked %.1f minutes ago, interval: %dm)",
+                     collection_name, (current_time - last_check_time) / 60, check_interval_minutes)
         return False
     
     return True
@@ -327,137 +473,329 @@ def _get_workspace_from_metadata(metadata_list: List[Dict[str, Any]]) -> Optiona
     return Path(workspace_path) if workspace_path else None
 
 
-def _find_modified_files(metadata_list: List[Dict[str, Any]]) -> List[Path]:
-    """Find files that have been modified since indexing."""
-    files_to_reindex = []
-    
-    # Build file path set
-    file_paths = set()
+def _indexed_file_mtimes(metadata_list: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Collapse per-chunk metadata to {rel_path: last indexed mtime}, one entry per file."""
+    indexed = {}
     for metadata in metadata_list:
+        if not metadata:
+            continue
         file_path = metadata.get('file_path')
-        collection_root = metadata.get('collection_root')
-        if file_path and collection_root:
-            full_path = Path(collection_root) / file_path
-            file_paths.add((str(full_path), metadata.get('last_modified', 0)))
-    
-    # Check modifications
-    for file_path_str, last_indexed_time in file_paths:
-        file_path = Path(file_path_str)
-        if file_path.exists():
-            current_mtime = file_path.stat().st_mtime
-            if current_mtime > last_indexed_time:
-                logger.info(f"📝 File modified: {file_path_str} (indexed: {datetime.fromtimestamp(last_indexed_time).strftime('%H:%M')}, current: {datetime.fromtimestamp(current_mtime).strftime('%H:%M')})")
-                files_to_reindex.append(file_path)
+        if file_path:
+            last_modified = metadata.get('last_modified', 0)
+            if last_modified > indexed.get(file_path, -1.0):
+                indexed[file_path] = last_modified
+    return indexed
+
+
+def _scan_workspace(workspace_dir: Path) -> Dict[str, float]:
+    """Walk the workspace once and return {rel_path: mtime} for every indexable file."""
+    ignore_patterns = get_ignore_patterns()
+    max_file_size = get_max_file_size()
     
-    return files_to_reindex
+    current = {}
+    for entry in iter_files(workspace_dir, ignore_patterns):
+        if not is_allowed_extension(entry.name):
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        if st.st_size <= max_file_size:
+            current[os.path.relpath(entry.path, workspace_dir)] = st.st_mtime
+    return current
 
 
-def _find_deleted_files(metadata_list: List[Dict[str, Any]], workspace_dir: Path) -> List[str]:
-    """Find files that have been deleted since indexing."""
-    indexed_files = {metadata.get('file_path') for metadata in metadata_list if metadata.get('file_path')}
-    deleted_files = []
+def _stat_workspace_paths(workspace_dir: Path, rel_paths: Iterable[str]) -> Dict[str, float]:
+    """Return {rel_path: mtime} for the given paths that _scan_workspace would have found."""
+    ignore_re = compile_ignore_patterns(get_ignore_patterns())
+    max_file_size = get_max_file_size()
     
-    for indexed_file_path in indexed_files:
-        if indexed_file_path:
-            full_path = workspace_dir / indexed_file_path
-            if not full_path.exists():
-                deleted_files.append(indexed_file_path)
+    current = {}
+    for rel_path in rel_paths:
+        if not is_allowed_extension(os.path.basename(rel_path)) or ignore_re.search(rel_path):
+            continue
+        try:
+            st = os.stat(os.path.join(workspace_dir, rel_path))
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode) and st.st_size <= max_file_size:
+            current[rel_path] = st.st_mtime
+    return current
+
+
+def _get_watcher(collection_name: str, workspace_dir: Path) -> Optional[WorkspaceWatcher]:
+    """Filesystem watcher for a collection's workspace, started on first use.
     
-    return deleted_files
+    Returns None when watchdog is not installed or the workspace can't be
+    watched, in which case every check walks the workspace.
+    """
+    if collection_name not in _watchers:
+        watcher = WorkspaceWatcher(workspace_dir, get_ignore_patterns())
+        if watcher.start():
+            logger.info("👀 Watching %s for changes", workspace_dir)
+        else:
+            watcher = None
+        _watchers[collection_name] = watcher
+    return _watchers[collection_name]
 
 
-def _find_new_files(metadata_list: List[Dict[str, Any]], workspace_dir: Path) -> List[Path]:
-    """Find files that have been added to workspace since indexing."""
-    from code_indexer.utils import is_file_indexable
-    from code_indexer.config import get_allowed_extensions, get_ignore_patterns, get_max_file_size
+def _load_file_mtimes(collection_name: str) -> Optional[Tuple[str, Dict[str, float]]]:
+    """Load the collection's mtime sidecar, or None if it is missing or unreadable."""
+    try:
+        return load_file_mtimes(get_chromadb_config().database_path, collection_name)
+    except OSError as e:
+        logger.warning("Could not read file mtimes for '%s': %s", collection_name, e)
+        return None
+
+
+def _save_file_mtimes(collection_name: str, workspace_dir: Path, updated: Dict[str, float],
+                      removed: Iterable[str] = (), replace: bool = False) -> None:
+    """Record indexed file mtimes in the collection's sidecar (best effort)."""
+    try:
+        update_file_mtimes(get_chromadb_config().database_path, collection_name, workspace_dir,
+                           updated, removed, replace=replace)
+    except OSError as e:
+        logger.warning("Could not write file mtimes for '%s': %s", collection_name, e)
+
+
+def _diff_workspace(indexed: Dict[str, float], workspace_dir: Path,
+                    changed: Optional[Set[str]] = None) -> Tuple[List[Path], List[Path], List[str]]:
+    """Compare indexed files ({rel_path: mtime}) against one walk of the workspace.
     
-    # Get files already indexed
-    indexed_files = set()
-    for metadata in metadata_list:
-        if metadata and metadata.get('file_path'):
-            indexed_files.add(metadata['file_path'])
+    Indexed files that are gone, or no longer indexable (now ignored or too
+    large), count as deleted. With changed (rel paths reported by a watcher),
+    only those paths are stat'ed instead of walking the workspace.
     
-    # Find all indexable files in workspace
-    allowed_extensions = get_allowed_extensions()
-    ignore_patterns = get_ignore_patterns()
-    max_file_size = get_max_file_size()
+    Returns:
+        (new_files, modified_files, deleted_rel_paths)
+    """
+    if changed is None:
+        current = _scan_workspace(workspace_dir)
+    else:
+        current = _stat_workspace_paths(workspace_dir, changed)
+    new_paths, modified_paths, deleted_files = diff_file_mtimes(indexed, current, changed)
     
-    new_files = []
-    for file_path in workspace_dir.rglob("*"):
-        if file_path.is_file():
-            rel_path = str(file_path.relative_to(workspace_dir))
-            
-            # Skip if already indexed
-            if rel_path in indexed_files:
-                continue
-            
-            # Check if file is indexable
-            indexable, reason = is_file_indexable(file_path, allowed_extensions, ignore_patterns, max_file_size)
-            if indexable:
-                logger.info(f"📂 New file found: {file_path}")
-                new_files.append(file_path)
+    # Per-file lines are debug only; timestamps are formatted only when they will be logged
+    if logger.isEnabledFor(logging.DEBUG):
+        for rel_path in new_paths:
+            logger.debug("📂 New file found: %s", rel_path)
+        for rel_path in modified_paths:
+            logger.debug("📝 File modified: %s (indexed: %s, current: %s)", rel_path,
+                         datetime.fromtimestamp(indexed[rel_path]).strftime('%H:%M'),
+                         datetime.fromtimestamp(current[rel_path]).strftime('%H:%M'))
+    
+    new_files = [workspace_dir / rel_path for rel_path in new_paths]
+    modified_files = [workspace_dir / rel_path for rel_path in modified_paths]
+    if new_files or modified_files or deleted_files:
+        logger.info("🔍 %d new, %d modified, %d deleted files", len(new_files), len(modified_files), len(deleted_files))
+    return new_files, modified_files, deleted_files
+
+
+def _diff_metadata(metadata_list: List[Dict[str, Any]], workspace_dir: Path,
+                   current: Optional[Dict[str, float]] = None) -> Tuple[List[str], List[str], List[str]]:
+    """diff_file_mtimes() of chunk metadata against current, walking the workspace only if no scan is given."""
+    if current is None:
+        current = _scan_workspace(workspace_dir)
+    return diff_file_mtimes(_indexed_file_mtimes(metadata_list), current)
+
+
+def _find_modified_files(metadata_list: List[Dict[str, Any]],
+                         current: Optional[Dict[str, float]] = None) -> List[Path]:
+    """Find files that have been modified since indexing.
     
-    return new_files
+    current is an optional {rel_path: mtime} scan (see _scan_workspace) to
+    share between calls instead of walking the workspace again.
+    """
+    workspace_dir = _get_workspace_from_metadata(metadata_list)
+    if not workspace_dir:
+        return []
+    return [workspace_dir / rel_path for rel_path in _diff_metadata(metadata_list, workspace_dir, current)[1]]
+
+
+def _find_deleted_files(metadata_list: List[Dict[str, Any]], workspace_dir: Path,
+                        current: Optional[Dict[str, float]] = None) -> List[str]:
+    """Find files that have been deleted since indexing."""
+    return _diff_metadata(metadata_list, workspace_dir, current)[2]
+
+
+def _find_new_files(metadata_list: List[Dict[str, Any]], workspace_dir: Path,
+                    current: Optional[Dict[str, float]] = None) -> List[Path]:
+    """Find files that have been added to workspace since indexing."""
+    return [workspace_dir / rel_path for rel_path in _diff_metadata(metadata_list, workspace_dir, current)[0]]
 
 
 async def _process_file_updates(collection, files_to_reindex: List[Path], new_files: List[Path], 
-                               deleted_files: List[str], workspace_dir: Path, collection_name: str) -> None:
-    """Process file modifications, new files, and deletions."""
-    # Index new files
-    if new_files:
-        logger.info(f"📂 Indexing {len(new_files)} new files")
-        for file_path in new_files:
-            await reindex_single_file(collection, file_path, workspace_dir, collection_name)
+                               deleted_files: List[str], workspace_dir: Path, collection_name: str) -> bool:
+    """Process file modifications, new files, and deletions.
+    
+    Returns:
+        False if some files' chunks failed to store; those keep their old
+        recorded mtime, so the next check picks them up again
+    """
+    if new_files or files_to_reindex or deleted_files:
+        _invalidate_query_cache(collection_name)
     
-    # Re-index modified files
+    batch_size = get_index_batch_size()
+    documents, ids, metadatas = [], [], []
+    file_mtimes = {}
+    
+    if new_files:
+        logger.info("📂 Indexing %d new files", len(new_files))
     if files_to_reindex:
-        logger.info(f"📝 Re-indexing {len(files_to_reindex)} modified files")
-        for file_path in files_to_reindex:
-            await reindex_single_file(collection, file_path, workspace_dir, collection_name)
+        logger.info("📝 Re-indexing %d modified files", len(files_to_reindex))
+    
+    # Chunks already stored for these files are matched by content hash; "new"
+    # files are included in case a stale sidecar missed their chunks
+    files_to_index = new_files + files_to_reindex
+    rel_paths = [str(file_path.relative_to(workspace_dir)) for file_path in files_to_index]
+    existing = _existing_chunk_ids(collection, rel_paths, batch_size)
+    kept = {}
+    file_chunk_ids, written_ids = {}, set()
+    
+    for file_path, rel_path in zip(files_to_index, rel_paths):
+        file_existing = existing.get(rel_path, {})
+        start = len(ids)
+        _buffer_file_chunks(file_path, workspace_dir, documents, ids, metadatas, file_mtimes, file_existing, kept)
+        if rel_path in file_mtimes:
+            file_chunk_ids[rel_path] = ids[start:]
+        if len(ids) >= batch_size:
+            written_ids.update(_flush_chunks(collection, documents, ids, metadatas))
+    
+    written_ids.update(_flush_chunks(collection, documents, ids, metadatas))
+    
+    # Only files whose new chunks were all stored count as indexed; their
+    # stored chunks that were not matched are gone from the file
+    stale_ids = []
+    for rel_path, chunk_ids in file_chunk_ids.items():
+        if written_ids.issuperset(chunk_ids):
+            stale_ids.extend(chunk_id for ids_by_hash in existing.get(rel_path, {}).values() for chunk_id in ids_by_hash)
+        else:
+            del file_mtimes[rel_path]
+    _delete_chunk_ids(collection, stale_ids, batch_size)
+    _update_chunk_metadata(collection, {
+        chunk_id: metadata for chunk_id, metadata in kept.items() if metadata['file_path'] in file_mtimes
+    }, batch_size)
     
     # Remove chunks for deleted files
     if deleted_files:
-        logger.info(f"🗑️  Removing chunks for {len(deleted_files)} deleted files")
-        for deleted_file in deleted_files:
-            logger.info(f"🗑️  Cleaning up deleted file: {deleted_file}")
-            collection.delete(where={"file_path": deleted_file})
+        logger.info("🗑️  Removing chunks for %d deleted files", len(deleted_files))
+        _delete_chunks_for_paths(collection, deleted_files, batch_size)
+    
+    if file_mtimes or deleted_files:
+        _save_file_mtimes(collection_name, workspace_dir, file_mtimes, deleted_files)
+    return len(file_mtimes) == len(file_chunk_ids)
 
 
-async def reindex_single_file(collection, file_path: Path, workspace_dir: Path, collection_name: str) -> None:
-    """Re-index a single modified file."""
+def _existing_chunk_ids(collection, rel_paths: List[str], batch_size: int) -> Dict[str, Dict[Optional[str], List[str]]]:
+    """Fetch {rel_path: {chunk_hash: [ids]}} for chunks already stored for the given files.
+    
+    Chunks indexed without a chunk_hash are grouped under None and never match.
+    """
+    existing = {}
+    for start in range(0, len(rel_paths), batch_size):
+        result = collection.get(
+            where={"file_path": {"$in": rel_paths[start:start + batch_size]}},
+            include=["metadatas"]
+        )
+        for chunk_id, metadata in zip(result['ids'], result['metadatas']):
+            by_hash = existing.setdefault(metadata.get('file_path'), {})
+            by_hash.setdefault(metadata.get('chunk_hash'), []).append(chunk_id)
+    return existing
+
+
+def _delete_chunk_ids(collection, chunk_ids: List[str], batch_size: int) -> None:
+    """Delete chunks by ID in batches, clearing the list in place."""
+    for start in range(0, len(chunk_ids), batch_size):
+        collection.delete(ids=chunk_ids[start:start + batch_size])
+    chunk_ids.clear()
+
+
+def _update_chunk_metadata(collection, kept: Dict[str, Dict[str, Any]], batch_size: int) -> None:
+    """Refresh metadata of unchanged chunks in batches; their embeddings are left alone."""
+    items = list(kept.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        collection.update(ids=[chunk_id for chunk_id, _ in batch], metadatas=[metadata for _, metadata in batch])
+
+
+def _delete_chunks_for_paths(collection, rel_paths: List[str], batch_size: int) -> None:
+    """Delete chunks for many files with one $in filter per batch_size paths."""
+    for start in range(0, len(rel_paths), batch_size):
+        collection.delete(where={"file_path": {"$in": rel_paths[start:start + batch_size]}})
+
+
+def _buffer_file_chunks(file_path: Path, workspace_dir: Path, documents: List[str],
+                        ids: List[str], metadatas: List[Dict[str, Any]],
+                        file_mtimes: Optional[Dict[str, float]] = None,
+                        existing: Optional[Dict[Optional[str], List[str]]] = None,
+                        kept: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+    """Read and chunk a file, appending its chunks to the batch buffers. Returns the distinct chunk count.
+    
+    When file_mtimes is given, the file's mtime is recorded in it once read.
+    When existing ({chunk_hash: [ids]} of the file's stored chunks) and kept are
+    given, chunks whose hash is already stored are not buffered: one matching
+    ID is popped from existing and mapped to the chunk's new metadata in kept,
+    so the IDs left in existing are the stale ones.
+    """
     try:
-        # Remove old chunks for this file using full relative path
         rel_path = str(file_path.relative_to(workspace_dir))
-        logger.info(f"🔄 Re-indexing modified file: {rel_path}")
-        collection.delete(where={"file_path": rel_path})
+        # The mtime is taken before the read, so an edit made mid-read is picked up next check
+        _, hashed_chunks, reason, mtime = load_file_chunks(file_path)
+        if hashed_chunks is None and reason.startswith("read error"):
+            logger.warning("Failed to re-index %s: %s", file_path, reason)
+            return 0
         
-        # Read and re-index the file
-        content = file_path.read_text(encoding='utf-8', errors='ignore')
-        chunks = [chunk.strip() for chunk in content.split('\n\n') if chunk.strip()]
+        # Binary files are recorded as read with no chunks, so stale ones get removed
+        hashed_chunks = hashed_chunks or []
+        if file_mtimes is not None:
+            file_mtimes[rel_path] = mtime
         
-        if chunks:
-            current_time = time.time()
+        if hashed_chunks:
+            queued = 0
             
-            ids = [f"{file_path.name}_{i}_{int(current_time)}" for i in range(len(chunks))]
-            metadatas = [
-                {
-                    'file_path': rel_path,
-                    'collection_root': str(workspace_dir),
-                    'last_modified': current_time
-                }
-                for _ in chunks
-            ]
+            for i, chunk, content_hash in hashed_chunks:
+                metadata = create_chunk_metadata(file_path, workspace_dir, i, mtime, content_hash)
+                if existing and existing.get(content_hash):
+                    # Unchanged chunk: keep its embedding, only refresh the metadata
+                    kept[existing[content_hash].pop()] = metadata
+                    continue
+                
+                ids.append(generate_chunk_id(rel_path, content_hash))
+                metadatas.append(metadata)
+                documents.append(chunk)
+                queued += 1
             
-            collection.add(
-                documents=chunks,
-                ids=ids,
-                metadatas=metadatas
-            )
+            logger.debug("✅ Queued %d of %d chunks from %s", queued, len(hashed_chunks), rel_path)
+        return len(hashed_chunks)
             
-            logger.info(f"✅ Re-indexed {len(chunks)} chunks from {rel_path}")
+    except Exception as e:
+        logger.warning("Failed to re-index %s: %s", file_path, e)
+        return 0
+
+
+async def reindex_single_file(collection, file_path: Path, workspace_dir: Path, collection_name: str) -> None:
+    """Re-index a single modified file."""
+    try:
+        _invalidate_query_cache(collection_name)
+        rel_path = str(file_path.relative_to(workspace_dir))
+        logger.info("🔄 Re-indexing modified file: %s", rel_path)
+        batch_size = get_index_batch_size()
+        existing = _existing_chunk_ids(collection, [rel_path], batch_size).get(rel_path, {})
+        
+        documents, ids, metadatas, file_mtimes, kept = [], [], [], {}, {}
+        _buffer_file_chunks(file_path, workspace_dir, documents, ids, metadatas, file_mtimes, existing, kept)
+        chunk_ids = list(ids)
+        if _flush_chunks(collection, documents, ids, metadatas) != chunk_ids:
+            # The old chunks and recorded mtime stay, so the next check retries the file
+            return
+        if file_mtimes:
+            # Only chunks whose content changed are deleted and re-embedded
+            _delete_chunk_ids(collection, [chunk_id for chunk_ids in existing.values() for chunk_id in chunk_ids], batch_size)
+        _update_chunk_metadata(collection, kept, batch_size)
+        _save_file_mtimes(collection_name, workspace_dir, file_mtimes)
             
     except Exception as e:
-        logger.warning(f"Failed to re-index {file_path}: {e}")
+        logger.warning("Failed to re-index %s: %s", file_path, e)
 
 
 
@@ -476,7 +814,7 @@ async def main():
                 server.create_initialization_options()
             )
     except Exception as e:
-        logger.error(f"❌ Server error: {e}")
+        logger.error("❌ Server error: %s", e)
         raise
 
 
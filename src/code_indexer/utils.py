@@ -1,91 +1,425 @@
 """Shared utilities for semantic search operations."""
 
 import hashlib
-import time
+import multiprocessing
+import os
+import re
+import sqlite3
+import stat
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Set, Tuple, Dict, Any, Optional
+from typing import AbstractSet, Tuple, Dict, Any, List, Optional, Iterable, Iterator, Union
 
+_SEP = re.escape(os.sep)
 
+# Target chunk length in characters and how much consecutive chunks overlap
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
 
+# Leading bytes checked for a NUL byte when deciding a file is binary
+BINARY_SNIFF_BYTES = 4096
 
-def should_ignore_path(file_path: Path, ignore_patterns: Set[str]) -> bool:
-    """Check if file path should be ignored based on patterns."""
-    if not isinstance(file_path, Path):
-        file_path = Path(file_path)
+# File count from which CLI reading and chunking moves to a process pool, and files per pool task
+PROCESS_POOL_MIN_FILES = 100
+PROCESS_POOL_CHUNKSIZE = 32
+
+# Stored mtimes can come back from Chroma a float ulp off the real mtime
+MTIME_TOLERANCE = 1e-3
+
+# Folder name cleanup for collection names: separators become '_', anything
+# else Chroma would reject in a name is dropped
+_COLLECTION_NAME_SEPARATORS = str.maketrans('- ', '__')
+_COLLECTION_NAME_INVALID_RE = re.compile(r'[^a-z0-9_]+')
+
+# Chroma directories whose journal mode has already been checked this process
+_wal_checked_dirs = set()
+
+
+@lru_cache(maxsize=32)
+def _split_ignore_patterns(ignore_patterns: frozenset) -> Tuple[frozenset, bool, Tuple[str, ...], Tuple[str, ...]]:
+    """Sort patterns by kind: (exact component names, '.*' present, lowercase suffixes, lowercase substrings).
     
-    path_parts = file_path.parts
-    path_str = str(file_path).lower()
+    - '.*' matches any path component starting with a dot (except '.').
+    - '*suffix' matches paths ending with suffix, case-insensitively.
+    - 'a/b' style patterns match as a case-insensitive substring.
+    - Anything else must equal a whole path component.
     
-    for pattern in ignore_patterns:
+    Paths are lowercased before suffix and substring matching, so patterns of
+    those kinds with uppercase letters can never match and are dropped.
+    """
+    exact = set()
+    suffixes = []
+    substrings = []
+    for pattern in sorted(ignore_patterns):
         if pattern == '.*':
-            # Special case: ignore any directory starting with dot
-            for part in path_parts:
-                if part.startswith('.') and len(part) > 1:  # Exclude '.' and '..' 
-                    return True
-        elif pattern.startswith('*'):
-            # Wildcard pattern
-            if path_str.endswith(pattern[1:]):
-                return True
+            continue
+        if pattern.startswith('*'):
+            if pattern == pattern.lower():
+                suffixes.append(pattern[1:])
+        elif '/' in pattern:
+            if pattern == pattern.lower():
+                substrings.append(pattern)
         else:
-            # Check if pattern matches any directory component exactly
-            if pattern in path_parts or file_path.name == pattern:
-                return True
-            # Also check for exact directory matches like 'static/admin'
-            if '/' in pattern and pattern in path_str:
-                return True
-                
-    return False
+            exact.add(pattern)
+    return frozenset(exact), '.*' in ignore_patterns, tuple(suffixes), tuple(substrings)
+
+
+@lru_cache(maxsize=32)
+def compile_ignore_patterns(ignore_patterns: frozenset) -> re.Pattern:
+    """Compile ignore patterns into a single regex searched against a path string.
+    
+    Same semantics as should_ignore_path (see _split_ignore_patterns), for
+    scanners that match many paths against one pattern set.
+    """
+    exact, ignore_hidden, suffixes, substrings = _split_ignore_patterns(ignore_patterns)
+    components = [rf'\.[^{_SEP}]'] if ignore_hidden else []
+    components.extend(rf'{re.escape(pattern)}(?:{_SEP}|\Z)' for pattern in sorted(exact))
+    
+    # One branch per pattern kind keeps the search fast
+    alternatives = []
+    if components:
+        alternatives.append(rf'(?:^|{_SEP})(?:{"|".join(components)})')
+    if suffixes:
+        alternatives.append(rf'(?i:{"|".join(map(re.escape, suffixes))})\Z')
+    if substrings:
+        alternatives.append(rf'(?i:{"|".join(map(re.escape, substrings))})')
+    
+    return re.compile('|'.join(alternatives) or r'(?!)')
+
+
+def should_ignore_path(file_path: Union[str, Path], ignore_patterns: AbstractSet[str]) -> bool:
+    """Check if file path should be ignored based on patterns."""
+    exact, ignore_hidden, suffixes, substrings = _split_ignore_patterns(frozenset(ignore_patterns))
+    path_str = os.fspath(file_path)
+    parts = path_str.split(os.sep)
+    
+    if not exact.isdisjoint(parts):
+        return True
+    if ignore_hidden and any(len(part) > 1 and part[0] == '.' for part in parts):
+        return True
+    
+    lowered = path_str.lower()
+    if suffixes and lowered.endswith(suffixes):
+        return True
+    return any(substring in lowered for substring in substrings)
+
+
+@lru_cache(maxsize=32)
+def _directory_patterns(ignore_patterns: frozenset) -> frozenset:
+    """Patterns that can prune a whole directory (suffix globs only apply to files)."""
+    return frozenset(pattern for pattern in ignore_patterns if not pattern.startswith('*'))
+
+
+def iter_files(root: Union[str, Path], ignore_patterns: AbstractSet[str]) -> Iterator[os.DirEntry]:
+    """Walk root with os.scandir and yield file entries that are not ignored.
+    
+    Ignore patterns are matched against paths relative to root, and ignored
+    directories are pruned before descending into them. Entries carry their
+    cached stat data, so callers should prefer entry.name, entry.path and
+    entry.stat() over building Path objects.
+    """
+    root = os.fspath(root)
+    ignore_patterns = frozenset(ignore_patterns)
+    file_ignore_re = compile_ignore_patterns(ignore_patterns)
+    dir_ignore_re = compile_ignore_patterns(_directory_patterns(ignore_patterns))
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as entries:
+                for entry in entries:
+                    rel_path = os.path.join(rel_dir, entry.name)
+                    if entry.is_dir(follow_symlinks=False):
+                        if not dir_ignore_re.search(rel_path):
+                            stack.append(rel_path)
+                    elif entry.is_file() and not file_ignore_re.search(rel_path):
+                        yield entry
+        except OSError:
+            # Unreadable directory, skip it like rglob does
+            continue
+
+
+def chunk_text(text: str, target: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping windows of roughly target characters.
+    
+    Each window ends at the last line break (or sentence end) in its second
+    half so code lines and sentences stay intact; the next window starts
+    overlap characters earlier, snapped to a line start when possible.
+    """
+    text = text.strip()
+    if len(text) <= target:
+        return [text] if text else []
+    
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + target, length)
+        if end < length:
+            floor = start + target // 2
+            cut = max(text.rfind('\n', floor, end), text.rfind('. ', floor, end) + 1)
+            if cut > floor:
+                end = cut + 1
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= length:
+            break
+        
+        next_start = max(end - overlap, start + 1)
+        line_start = text.find('\n', next_start, end)
+        start = line_start + 1 if line_start != -1 else next_start
+    
+    return chunks
+
+
+def chunk_document(text: str, suffix: str) -> List[str]:
+    """Chunk file content; Markdown keeps its paragraph split, everything else uses chunk_text."""
+    if suffix == '.md':
+        # Strip each paragraph once, then drop the empty ones
+        return [chunk for chunk in map(str.strip, text.split('\n\n')) if chunk]
+    return chunk_text(text)
+
+
+def read_text_file(file_path: Union[str, Path], max_file_size: Optional[int] = None) -> Tuple[Optional[str], str]:
+    """Read a file as UTF-8 text in one binary read, normalising newlines like text mode.
+    
+    Files larger than max_file_size are rejected without decoding (at most
+    max_file_size + 1 bytes are read), as are files with a NUL byte in their
+    first BINARY_SNIFF_BYTES bytes.
+    
+    Returns:
+        (text, "") or (None, reason_if_skipped)
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read() if max_file_size is None else f.read(max_file_size + 1)
+    
+    if max_file_size is not None and len(data) > max_file_size:
+        return None, f"file too large (> {max_file_size/1024/1024:.0f}MB)"
+    if b'\0' in data[:BINARY_SNIFF_BYTES]:
+        return None, "binary file (NUL byte)"
+    
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return data.decode('utf-8', errors='ignore'), ""
+
+
+def enable_wal_mode(db_dir: Union[str, Path]) -> None:
+    """Switch Chroma's SQLite file to WAL journaling for faster bulk inserts.
+    
+    Chroma keeps its own connection private, but journal_mode=WAL is stored in
+    the database file, so setting it from a separate connection sticks (other
+    PRAGMAs such as synchronous are per-connection and would not). This only
+    runs once per process and must be called before Chroma opens the file:
+    touching the file from another SQLite connection while Chroma has it open
+    releases Chroma's locks and its later reads fail with disk I/O errors.
+    WAL needs every process using the database on the same host, not a
+    network filesystem.
+    
+    Raises:
+        sqlite3.Error: if the database could not be opened or switched.
+    """
+    key = os.fspath(db_dir)
+    if key in _wal_checked_dirs:
+        return
+    _wal_checked_dirs.add(key)
+    
+    db_path = Path(db_dir)
+    db_path.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(db_path / "chroma.sqlite3", timeout=5)
+    try:
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+            conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
 
 
 def generate_collection_name(workspace_path: str) -> str:
     """Generate unique collection name from workspace path."""
     workspace_dir = Path(workspace_path)
-    folder_name = workspace_dir.name.lower().replace('-', '_').replace(' ', '_')
-    clean_name = ''.join(c for c in folder_name if c.isalnum() or c == '_')
+    # The folder name comes from the path as given and the hash from its absolute
+    # form, as collection names always have; relative paths depend on the cwd,
+    # so they are resolved before the cache lookup
+    return _collection_name_for(workspace_dir.name, str(workspace_dir.absolute()))
+
+
+@lru_cache(maxsize=64)
+def _collection_name_for(folder_name: str, absolute_path: str) -> str:
+    """Collection name from a folder name plus a short hash of the absolute workspace path.
+    
+    The hash stays SHA-256: collection names are persisted, so changing the
+    hash function would orphan every existing collection.
+    """
+    folder_name = folder_name.lower().translate(_COLLECTION_NAME_SEPARATORS)
+    clean_name = _COLLECTION_NAME_INVALID_RE.sub('', folder_name)
     
     # Generate short hash of full workspace path  
-    path_hash = hashlib.sha256(str(workspace_dir.absolute()).encode()).hexdigest()[:8]
+    path_hash = hashlib.sha256(absolute_path.encode()).hexdigest()[:8]
     return f"{clean_name}_{path_hash}"
 
 
-def is_file_indexable(file_path: Path, allowed_extensions: Set[str], ignore_patterns: Set[str], max_file_size: int) -> Tuple[bool, str]:
+def is_file_indexable(file_path: Path, allowed_extensions: AbstractSet[str], ignore_patterns: AbstractSet[str], max_file_size: int,
+                      stat_result: Optional[os.stat_result] = None) -> Tuple[bool, str]:
     """Check if file should be indexed and return reason if not.
     
+    Checks run cheapest first: extension, then ignore patterns, and only then
+    the stat, so most rejected paths cost no syscall. Pass stat_result (e.g.
+    from os.DirEntry.stat()) when the caller already has it; otherwise the
+    file is stat()ed once here.
+    
     Returns:
         (is_indexable, reason_if_not)
     """
-    if not file_path.is_file():
-        return False, "not a file"
-    
     if file_path.suffix.lower() not in allowed_extensions:
         return False, f"extension {file_path.suffix} not in allowlist"
     
     if should_ignore_path(file_path, ignore_patterns):
         return False, "path matches ignore pattern"
     
+    if stat_result is None:
+        try:
+            stat_result = file_path.stat()
+        except OSError:
+            return False, "not a file"
+    
+    if not stat.S_ISREG(stat_result.st_mode):
+        return False, "not a file"
+    
+    file_size = stat_result.st_size
+    if file_size > max_file_size:
+        return False, f"file too large ({file_size/1024/1024:.1f}MB > {max_file_size/1024/1024:.0f}MB)"
+    
+    return True, ""
+
+
+def diff_file_mtimes(indexed: Dict[str, float], current: Dict[str, float],
+                     candidates: Optional[Iterable[str]] = None) -> Tuple[List[str], List[str], List[str]]:
+    """Compare indexed file mtimes against current ones, both {rel_path: mtime}.
+    
+    A file counts as modified once its mtime is more than MTIME_TOLERANCE past
+    the indexed one. Indexed files missing from current count as deleted; when
+    current only covers some paths (e.g. those a watcher reported), pass them
+    as candidates so only those can be reported deleted.
+    
+    Returns:
+        (new_rel_paths, modified_rel_paths, deleted_rel_paths)
+    """
+    new_paths = []
+    modified_paths = []
+    for rel_path, mtime in current.items():
+        last_indexed = indexed.get(rel_path)
+        if last_indexed is None:
+            new_paths.append(rel_path)
+        elif mtime - last_indexed > MTIME_TOLERANCE:
+            modified_paths.append(rel_path)
+    
+    if candidates is None:
+        candidates = indexed
+    deleted_paths = [rel_path for rel_path in candidates if rel_path in indexed and rel_path not in current]
+    return new_paths, modified_paths, deleted_paths
+
+
+def chunk_hash(chunk: str) -> str:
+    """Content hash of a chunk, stored in its metadata to detect unchanged chunks."""
+    return hashlib.blake2b(chunk.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def hash_chunks(chunks: List[str]) -> List[Tuple[int, str, str]]:
+    """Return (chunk_index, chunk, chunk_hash) for each distinct chunk of one file.
+    
+    Repeated content within a file is kept once, so content-hash chunk IDs
+    stay unique within the file.
+    """
+    seen = set()
+    hashed = []
+    for i, chunk in enumerate(chunks):
+        content_hash = chunk_hash(chunk)
+        if content_hash not in seen:
+            seen.add(content_hash)
+            hashed.append((i, chunk, content_hash))
+    return hashed
+
+
+def load_file_chunks(file_path: Union[str, Path], max_file_size: Optional[int] = None
+                     ) -> Tuple[Path, Optional[List[Tuple[int, str, str]]], str, float]:
+    """Size-check, read, chunk and hash one file.
+    
+    Module-level and free of Chroma state, so it can run on worker threads or
+    in worker processes.
+    
+    Returns:
+        (file_path, hash_chunks() output or None if skipped, reason_if_skipped,
+         mtime or 0.0 if the file could not be stat()ed)
+    """
+    file_path = Path(file_path)
     try:
-        file_size = file_path.stat().st_size
-        if file_size > max_file_size:
-            return False, f"file too large ({file_size/1024/1024:.1f}MB > {max_file_size/1024/1024:.0f}MB)"
+        st = file_path.stat()
+        if max_file_size is not None and st.st_size > max_file_size:
+            return file_path, None, f"file too large ({st.st_size/1024/1024:.1f}MB > {max_file_size/1024/1024:.0f}MB)", st.st_mtime
+        
+        content, reason = read_text_file(file_path, max_file_size)
     except Exception as e:
-        return False, f"stat error: {e}"
+        return file_path, None, f"read error: {e}", 0.0
     
-    return True, ""
+    if content is None:
+        return file_path, None, reason, st.st_mtime
+    return file_path, hash_chunks(chunk_document(content, file_path.suffix.lower())), "", st.st_mtime
+
 
+def load_file_chunks_batch(file_paths: List[Union[str, Path]], max_file_size: Optional[int] = None
+                           ) -> List[Tuple[Path, Optional[List[Tuple[int, str, str]]], str, float]]:
+    """load_file_chunks() for several files in one task, amortizing process pool IPC."""
+    return [load_file_chunks(file_path, max_file_size) for file_path in file_paths]
 
-def create_chunk_metadata(file_path: Path, workspace_dir: Path, chunk_index: int) -> Dict[str, Any]:
-    """Create metadata for a chunk."""
-    current_time = time.time()
-    return {
+
+def create_file_executor(file_count: int, use_processes: bool = False) -> Tuple[Executor, int]:
+    """Pick an executor for reading and chunking file_count files.
+    
+    The default is a thread pool fed one file per task. Chunking holds the
+    GIL, so short-lived CLI runs may pass use_processes=True to get a process
+    pool fed PROCESS_POOL_CHUNKSIZE files per task once there are
+    PROCESS_POOL_MIN_FILES files (below that, pool startup would dominate).
+    Workers are spawned rather than forked so they don't inherit Chroma's
+    threads and locks; spawned workers re-import the main module and share
+    its stdout, so the MCP server, whose stdout is the protocol stream, must
+    stay on threads.
+    
+    Returns:
+        (executor, files per task)
+    """
+    if use_processes and file_count >= PROCESS_POOL_MIN_FILES:
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        return executor, PROCESS_POOL_CHUNKSIZE
+    return ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)), 1
+
+
+def create_chunk_metadata(file_path: Path, workspace_dir: Path, chunk_index: int,
+                          mtime: Optional[float] = None, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Create metadata for a chunk.
+    
+    last_modified is the file's mtime, so modification checks compare like with
+    like; pass mtime when the file has already been stat()ed.
+    """
+    if mtime is None:
+        mtime = file_path.stat().st_mtime
+    metadata = {
         "file_path": str(file_path.relative_to(workspace_dir)),
         "collection_root": str(workspace_dir),
-        "last_modified": current_time,
+        "last_modified": mtime,
         "chunk_index": chunk_index
     }
+    if content_hash is not None:
+        metadata["chunk_hash"] = content_hash
+    return metadata
 
 
-def generate_chunk_id(file_path: Path, chunk_index: int, timestamp: Optional[float] = None) -> str:
-    """Generate unique chunk ID."""
-    if timestamp is None:
-        timestamp = time.time()
-    return f"{file_path.name}_{chunk_index}_{int(timestamp)}"
\ No newline at end of file
+def generate_chunk_id(rel_path: str, content_hash: str) -> str:
+    """Generate a chunk ID from the file's relative path and the chunk's content hash.
+    
+    Unchanged content always maps to the same ID, so collection.upsert()
+    replaces chunks in place instead of piling up timestamped copies.
+    """
+    return f"{rel_path}:{content_hash[:16]}"
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""Optional filesystem watching, so modification checks only look at paths that changed.
+
+With watchdog installed, an observer (inotify, FSEvents or
+ReadDirectoryChangesW) records changed files between checks. Without it,
+or whenever the recorded paths might be incomplete, checks fall back to
+walking the whole workspace.
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import AbstractSet, Any, Optional, Set, Tuple, Union
+
+from .config import is_allowed_extension
+from .utils import compile_ignore_patterns
+
+logger = logging.getLogger(__name__)
+
+# Changed files held between checks before falling back to a full walk
+MAX_PENDING_PATHS = 10000
+
+# Seconds between full walks even while watching, to catch events the OS dropped
+# (e.g. an inotify queue overflow)
+FULL_SCAN_INTERVAL = 600
+
+# watchdog event types that can change what is indexed (opened/closed events can't)
+_CHANGE_EVENTS = frozenset({'created', 'modified', 'deleted', 'moved'})
+
+
+class WorkspaceWatcher:
+    """Changed files under one workspace, collected between modification checks.
+    
+    The watcher is its own watchdog event handler: events are recorded on the
+    observer thread and handed over by drain(). drain() returns None, meaning
+    the caller must walk the whole workspace, on the first call after start,
+    every FULL_SCAN_INTERVAL seconds, and whenever the recorded paths may be
+    incomplete: a directory was created, deleted or moved, more than
+    MAX_PENDING_PATHS files changed, or request_full_scan() was called.
+    """
+    
+    def __init__(self, workspace_dir: Union[str, Path], ignore_patterns: AbstractSet[str]) -> None:
+        self.workspace_dir = Path(workspace_dir)
+        # Some observers report resolved paths (e.g. FSEvents under /private/var
+        # on macOS), so events may arrive under either spelling of the workspace
+        prefix = os.path.join(str(workspace_dir), '')
+        real_prefix = os.path.join(os.path.realpath(workspace_dir), '')
+        self._prefixes: Tuple[str, ...] = (prefix,) if prefix == real_prefix else (prefix, real_prefix)
+        ignore_patterns = frozenset(ignore_patterns)
+        self._file_ignore_re = compile_ignore_patterns(ignore_patterns)
+        # Suffix globs only apply to files, as in iter_files
+        self._dir_ignore_re = compile_ignore_patterns(
+            frozenset(pattern for pattern in ignore_patterns if not pattern.startswith('*'))
+        )
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._full_scan = True
+        self._last_full_scan = 0.0
+        self._observer = None
+    
+    def start(self) -> bool:
+        """Start watching; False if watchdog is not installed or the observer could not start."""
+        try:
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+        
+        observer = Observer()
+        try:
+            observer.schedule(self, str(self.workspace_dir), recursive=True)
+            observer.start()
+        except Exception as e:
+            # e.g. the inotify watch limit is too low for the workspace
+            logger.warning("Could not watch %s, falling back to full scans: %s", self.workspace_dir, e)
+            return False
+        
+        self._observer = observer
+        return True
+    
+    def stop(self) -> None:
+        """Stop the observer thread, if it was started."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+    
+    def dispatch(self, event: Any) -> None:
+        """watchdog event handler entry point, called on the observer thread."""
+        if event.event_type not in _CHANGE_EVENTS:
+            return
+        if event.is_directory and event.event_type == 'modified':
+            # Only says an entry inside changed, and that entry has its own event
+            return
+        
+        self.record(event.src_path, event.is_directory)
+        if event.event_type == 'moved':
+            self.record(event.dest_path, event.is_directory)
+    
+    def record(self, path: Union[str, bytes], is_directory: bool = False) -> None:
+        """Note a changed file, or a directory created, deleted or moved, by absolute path."""
+        rel_path = self._relative_path(os.fsdecode(path))
+        if rel_path is None:
+            # A path we can't place in the workspace may still be in it
+            logger.debug("Unexpected watch event path %s, next check walks the workspace", path)
+            self.request_full_scan()
+            return
+        
+        # Paths the walk would never index can't change the collection
+        if is_directory:
+            if self._dir_ignore_re.search(rel_path):
+                return
+        elif self._file_ignore_re.search(rel_path) or not is_allowed_extension(os.path.basename(rel_path)):
+            return
+        
+        with self._lock:
+            if is_directory or len(self._pending) >= MAX_PENDING_PATHS:
+                # Too much changed to list; the next check walks everything
+                self._full_scan = True
+                self._pending.clear()
+            elif not self._full_scan:
+                self._pending.add(rel_path)
+    
+    def _relative_path(self, path: str) -> Optional[str]:
+        """Workspace-relative form of an event path, or None if it is not under the workspace."""
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                return path[len(prefix):]
+        
+        # Resolve symlinked parents only; the file itself may be a symlink out of the workspace
+        head, tail = os.path.split(path)
+        path = os.path.join(os.path.realpath(head), tail)
+        if path.startswith(self._prefixes[-1]):
+            return path[len(self._prefixes[-1]):]
+        return None
+    
+    def request_full_scan(self) -> None:
+        """Make the next drain() ask for a full walk, e.g. after a failed update."""
+        with self._lock:
+            self._full_scan = True
+            self._pending.clear()
+    
+    def drain(self) -> Optional[Set[str]]:
+        """Take the workspace-relative paths changed since the last drain.
+        
+        Returns:
+            The changed paths, or None if the caller must walk the whole workspace
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_full_scan >= FULL_SCAN_INTERVAL:
+                self._full_scan = True
+            pending, self._pending = self._pending, set()
+            full_scan, self._full_scan = self._full_scan, False
+            if full_scan:
+                self._last_full_scan = now
+        return None if full_scan else pending
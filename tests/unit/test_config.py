@@ -9,7 +9,13 @@ import sys
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
-from code_indexer.config import get_allowed_extensions, get_ignore_patterns, get_max_file_size
+from code_indexer.config import (
+    get_allowed_extensions,
+    get_ignore_patterns,
+    get_max_file_size,
+    is_allowed_extension,
+    SemanticSearchConfig
+)
 
 
 def test_get_allowed_extensions():
@@ -19,7 +25,7 @@ def test_get_allowed_extensions():
             m.setenv('WORKSPACE_PATH', temp_dir)
             extensions = get_allowed_extensions()
     
-    assert isinstance(extensions, set)
+    assert isinstance(extensions, frozenset)
     assert '.py' in extensions
     assert '.js' in extensions  
     assert '.md' in extensions
@@ -32,6 +38,19 @@ def test_get_allowed_extensions():
     assert '.jpg' not in extensions
 
 
+def test_is_allowed_extension():
+    """Test extension lookup by file name matches Path.suffix semantics."""
+    assert is_allowed_extension('main.py')
+    assert is_allowed_extension('README.MD')
+    assert is_allowed_extension('archive.tar.json')
+    assert not is_allowed_extension('image.png')
+    assert not is_allowed_extension('Makefile')
+    assert not is_allowed_extension('trailing.')
+    
+    for name in ['main.py', '.bashrc', 'notes.txt', 'a.b.c', '.gitignore', 'x.', 'noext']:
+        assert is_allowed_extension(name) == (Path(name).suffix.lower() in get_allowed_extensions())
+
+
 def test_get_ignore_patterns():
     """Test that ignore patterns are returned correctly."""
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -39,7 +58,7 @@ def test_get_ignore_patterns():
             m.setenv('WORKSPACE_PATH', temp_dir)
             patterns = get_ignore_patterns()
     
-    assert isinstance(patterns, set)
+    assert isinstance(patterns, frozenset)
     assert '.venv' in patterns
     assert 'node_modules' in patterns
     assert '.git' in patterns
@@ -69,10 +88,21 @@ def test_config_with_workspace_path():
         patterns = get_ignore_patterns()
         max_size = get_max_file_size()
         
-        assert isinstance(extensions, set)
-        assert isinstance(patterns, set)
+        assert isinstance(extensions, frozenset)
+        assert isinstance(patterns, frozenset)
         assert isinstance(max_size, int)
         
         # Clean up
         if 'WORKSPACE_PATH' in os.environ:
-            del os.environ['WORKSPACE_PATH']
\ No newline at end of file
+            del os.environ['WORKSPACE_PATH']
+
+
+def test_workspace_path_keeps_dotdot_segments():
+    """Test the validated workspace path is absolutized without normalizing '..'."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        (Path(temp_dir) / 'sub').mkdir()
+        workspace_path = os.path.join(temp_dir, 'sub', '..')
+        
+        config = SemanticSearchConfig(workspace_path=workspace_path)
+        assert config.workspace_path == str(Path(workspace_path).absolute())
+        assert config.workspace_path.endswith('..')
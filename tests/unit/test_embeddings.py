@@ -0,0 +1,51 @@
+"""Test batched local embedding."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from code_indexer import embeddings
+from code_indexer.embeddings import embed_documents, embed_query, EMBEDDING_BATCH_SIZE
+
+
+class FakeModel:
+    """Stands in for a SentenceTransformer and records encode() calls."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def encode(self, documents, batch_size, convert_to_numpy, normalize_embeddings):
+        self.calls.append((len(documents), batch_size, normalize_embeddings))
+        return np.ones((len(documents), 3), dtype=np.float32)
+
+
+def test_embed_documents_uses_model(monkeypatch):
+    """Test documents are embedded in one batched encode() call."""
+    model = FakeModel()
+    monkeypatch.setattr(embeddings, 'get_embedding_model', lambda: model)
+    
+    result = embed_documents(['a', 'b', 'c'])
+    assert result.shape == (3, 3)
+    assert model.calls == [(3, EMBEDDING_BATCH_SIZE, True)]
+    
+    assert embed_documents([]) is None
+    assert len(model.calls) == 1
+
+
+def test_embed_documents_without_model(monkeypatch):
+    """Test Chroma is left to embed when no local model is available."""
+    monkeypatch.setattr(embeddings, 'get_embedding_model', lambda: None)
+    assert embed_documents(['a']) is None
+
+
+def test_embed_query(monkeypatch):
+    """Test a query is embedded with the document model, or left to Chroma without one."""
+    monkeypatch.setattr(embeddings, 'get_embedding_model', lambda: FakeModel())
+    assert embed_query('find auth').shape == (3,)
+    
+    monkeypatch.setattr(embeddings, 'get_embedding_model', lambda: None)
+    assert embed_query('find auth') is None
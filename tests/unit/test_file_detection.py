@@ -1,20 +1,56 @@
 """Test file modification and new file detection."""
 
 import pytest
+import re
 import tempfile
 import time
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import chromadb
 from chromadb.config import Settings as ChromaSettings
+from chromadb.errors import NotFoundError
 
 # Add src to path for imports  
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
-from code_indexer.utils import generate_collection_name
+from code_indexer.utils import generate_collection_name, generate_chunk_id, iter_files, chunk_hash, read_text_file
 from code_indexer.config import get_allowed_extensions, get_ignore_patterns, get_max_file_size
 
+# Chunks per collection.add() call when indexing a test workspace
+ADD_BATCH_SIZE = 1000
+
+# A stripped, non-empty paragraph: runs of text not containing a blank line
+_CHUNK_RE = re.compile(r"\S(?:(?:[^\n]|\n(?!\n))*\S)?")
+
+
+@pytest.fixture(scope="session")
+def indexing_config():
+    """Resolve (allowed extensions, ignore patterns, max file size) once per test run."""
+    return get_allowed_extensions(), get_ignore_patterns(), get_max_file_size()
+
+
+def _walk_indexable(root: Path, allowed_extensions, ignore_patterns, max_file_size):
+    """Yield (path, rel_path) for indexable files under root.
+    
+    Ignored directories are pruned by the scandir walk, and the extension is
+    checked before the (cached) DirEntry stat. Entry paths start with root,
+    so rel_path is sliced off the string instead of calling relative_to.
+    """
+    prefix_len = len(os.path.join(str(root), ''))
+    for entry in iter_files(root, ignore_patterns):
+        if os.path.splitext(entry.name)[1].lower() not in allowed_extensions:
+            continue
+        if entry.stat().st_size <= max_file_size:
+            yield Path(entry.path), entry.path[prefix_len:]
+
+
+def _read_and_chunk(file_path: Path):
+    """Read a file and return its (paragraph, chunk_hash) pairs."""
+    content, _ = read_text_file(file_path)
+    return [(match.group(), chunk_hash(match.group())) for match in _CHUNK_RE.finditer(content or '')]
+
 
 class TestFileDetection:
     """Test file modification and new file detection capabilities."""
@@ -32,9 +68,9 @@ class TestFileDetection:
             
             yield workspace
     
-    @pytest.fixture  
+    @pytest.fixture(scope="session")
     def chroma_client(self):
-        """Create a test ChromaDB client."""
+        """Create one test ChromaDB client shared by all tests."""
         with tempfile.TemporaryDirectory() as temp_db:
             client = chromadb.PersistentClient(
                 path=temp_db,
@@ -42,7 +78,16 @@ class TestFileDetection:
             )
             yield client
     
-    def index_workspace_initially(self, workspace: Path, client: chromadb.ClientAPI):
+    @pytest.fixture(autouse=True)
+    def drop_workspace_collection(self, chroma_client, temp_workspace):
+        """Delete each test's collection; names differ per temp workspace, so tests don't collide."""
+        yield
+        try:
+            chroma_client.delete_collection(generate_collection_name(str(temp_workspace)))
+        except NotFoundError:
+            pass
+    
+    def index_workspace_initially(self, workspace: Path, client: chromadb.ClientAPI, indexing_config):
         """Index workspace for the first time (simulate initial indexing)."""
         collection_name = generate_collection_name(str(workspace))
         collection = client.get_or_create_collection(
@@ -50,52 +95,66 @@ class TestFileDetection:
             metadata={"hnsw:space": "cosine"}
         )
         
-        allowed_extensions = get_allowed_extensions()
-        ignore_patterns = get_ignore_patterns()
-        max_file_size = get_max_file_size()
-        
-        # Index all initial files
-        for file_path in workspace.rglob("*"):
-            if (file_path.is_file() and 
-                file_path.suffix.lower() in allowed_extensions and
-                file_path.stat().st_size <= max_file_size):
-                
+        allowed_extensions, ignore_patterns, max_file_size = indexing_config
+        
+        # Files are read and chunked on worker threads; chunks are collected here in walk
+        # order and added in batches. Content repeated anywhere in the workspace
+        # (license headers etc.) is added once
+        all_docs, all_ids, all_meta = [], [], []
+        seen_hashes = set()
+        collection_root = str(workspace)
+        with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) as executor:
+            futures = [
+                (file_path, rel_path, executor.submit(_read_and_chunk, file_path))
+                for file_path, rel_path in _walk_indexable(workspace, allowed_extensions, ignore_patterns, max_file_size)
+            ]
+            for file_path, rel_path, future in futures:
                 try:
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                    chunks = [chunk.strip() for chunk in content.split('\n\n') if chunk.strip()]
-                    
-                    if chunks:
-                        current_time = time.time()
-                        ids = [f"{file_path.name}_{i}_{int(current_time)}" for i in range(len(chunks))]
-                        metadatas = [
-                            {
-                                "file_path": str(file_path.relative_to(workspace)),
-                                "collection_root": str(workspace),
-                                "last_modified": current_time
-                            } 
-                            for _ in chunks
-                        ]
-                        
-                        collection.add(
-                            documents=chunks,
-                            ids=ids,
-                            metadatas=metadatas
-                        )
+                    paragraphs = future.result()
                 except Exception as e:
                     print(f"Failed to index {file_path}: {e}")
+                    continue
+                
+                chunks = []
+                for chunk, content_hash in paragraphs:
+                    if content_hash not in seen_hashes:
+                        seen_hashes.add(content_hash)
+                        chunks.append((chunk, content_hash))
+                
+                if chunks:
+                    # One timestamp per file; ids reuse the dedup hash
+                    metadata = {
+                        "file_path": rel_path,
+                        "collection_root": collection_root,
+                        "last_modified": time.time()
+                    }
+                    for chunk, content_hash in chunks:
+                        all_ids.append(generate_chunk_id(rel_path, content_hash))
+                        all_meta.append(dict(metadata))
+                        all_docs.append(chunk)
+        
+        for start in range(0, len(all_docs), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            try:
+                collection.add(
+                    documents=all_docs[start:end],
+                    ids=all_ids[start:end],
+                    metadatas=all_meta[start:end]
+                )
+            except Exception as e:
+                print(f"Failed to index chunks {start}-{end}: {e}")
         
         return collection_name, collection
     
     def check_file_in_collection(self, collection, workspace: Path, filename: str) -> bool:
         """Check if a file exists in the collection."""
-        rel_path = filename
-        all_data = collection.get()
-        
-        if all_data['metadatas']:
-            for metadata in all_data['metadatas']:
-                if metadata and metadata.get('file_path') == rel_path:
-                    return True
-        return False
+        # Filtered in Chroma; at most one id comes back
+        result = collection.get(where={"file_path": filename}, limit=1, include=[])
+        return bool(result['ids'])
+    
+    def check_file_in_set(self, indexed_files: set, filename: str) -> bool:
+        """Check a file against indexed paths fetched earlier with one collection.get()."""
+        return filename in indexed_files
     
     def search_collection_for_content(self, collection, search_term: str) -> list:
         """Search collection for specific content."""
@@ -108,9 +167,9 @@ class TestFileDetection:
         except Exception:
             return []
     
-    def test_initial_indexing_works(self, temp_workspace, chroma_client):
+    def test_initial_indexing_works(self, temp_workspace, chroma_client, indexing_config):
         """Test that initial indexing works correctly."""
-        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client)
+        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client, indexing_config)
         
         # Verify initial files are indexed
         assert self.check_file_in_collection(collection, temp_workspace, "main.py")
@@ -122,11 +181,10 @@ class TestFileDetection:
         assert len(results) > 0
         assert any("hello world" in result for result in results)
     
-    def test_new_file_detection_fails(self, temp_workspace, chroma_client):
+    def test_new_file_detection_fails(self, temp_workspace, chroma_client, indexing_config):
         """Test that demonstrates the bug: new files are not detected."""
         # Initial indexing
-        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client)
-        initial_count = collection.count()
+        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client, indexing_config)
         
         # Wait a moment to ensure different timestamp
         time.sleep(0.1)
@@ -147,55 +205,30 @@ class TestFileDetection:
         
         # Simulate the modification check that should happen during search
         # This is the key test: after adding a new file, can we find it?
-        from code_indexer.server import _find_modified_files, _find_deleted_files
+        from code_indexer.server import _diff_workspace, _indexed_file_mtimes
         
         # Check if the new file would be detected by current functions
         workspace_dir = temp_workspace
-        all_data = collection.get()
+        # One fetch serves the count, the indexed path set and the detection helpers
+        all_data = collection.get(include=["metadatas"])
+        initial_count = len(all_data['ids'])
+        all_metadata = all_data['metadatas'] or []
+        indexed_files = {metadata['file_path'] for metadata in all_metadata if metadata and metadata.get('file_path')}
         
-        modified_files = _find_modified_files(all_data.get('metadatas', []))
-        deleted_files = _find_deleted_files(all_data.get('metadatas', []), workspace_dir)
+        # New, modified and deleted files come from the production diff, with one workspace walk
+        new_files, modified_files, deleted_files = _diff_workspace(_indexed_file_mtimes(all_metadata), workspace_dir)
         
         print(f"Modified files detected: {modified_files}")
         print(f"Deleted files detected: {deleted_files}") 
         print(f"New file exists: {new_file.exists()}")
-        
-        # THE BUG: Current functions don't detect NEW files at all!
-        # This test documents the bug - new_file should be detected but won't be
-        # because there's no _find_new_files function
-        
-        # Let's manually check if the new file would be detected
-        # (This simulates what a _find_new_files function should do)
-        indexed_files = set()
-        for metadata in all_data.get('metadatas', []):
-            if metadata and metadata.get('file_path'):
-                indexed_files.add(metadata['file_path'])
-        
-        # Find all indexable files in workspace
-        from code_indexer.utils import is_file_indexable
-        allowed_extensions = get_allowed_extensions()
-        ignore_patterns = get_ignore_patterns() 
-        max_file_size = get_max_file_size()
-        
-        all_workspace_files = set()
-        for file_path in workspace_dir.rglob("*"):
-            if file_path.is_file():
-                rel_path = str(file_path.relative_to(workspace_dir))
-                indexable, _ = is_file_indexable(file_path, allowed_extensions, ignore_patterns, max_file_size)
-                if indexable:
-                    all_workspace_files.add(rel_path)
-        
-        # New files = files in workspace but not in collection
-        new_files = all_workspace_files - indexed_files
         print(f"New files found: {new_files}")
         
         # THE BUG TEST: The new file should be in new_files
-        new_file_rel = str(new_file.relative_to(workspace_dir))
-        assert new_file_rel in new_files, f"New file {new_file_rel} should be detected in new_files: {new_files}"
+        assert new_file in new_files, f"New file {new_file} should be detected in new_files: {new_files}"
         
         # The new file should NOT be indexed yet (this demonstrates the bug)
         # Because the system doesn't detect new files, this will be False:
-        new_file_indexed = self.check_file_in_collection(collection, temp_workspace, "quantum_meditation.py")
+        new_file_indexed = self.check_file_in_set(indexed_files, "quantum_meditation.py")
         
         # BUG DEMONSTRATION: The new file should not be indexed yet
         assert not new_file_indexed, "BUG DEMONSTRATED: New file should not be indexed yet because system doesn't detect new files"
@@ -210,10 +243,10 @@ class TestFileDetection:
         print(f"❌ File indexed: {new_file_indexed}")
         print(f"❌ Collection count unchanged: {initial_count} -> {final_count}")
     
-    def test_file_modification_detection(self, temp_workspace, chroma_client):
+    def test_file_modification_detection(self, temp_workspace, chroma_client, indexing_config):
         """Test that modified files are detected and reindexed."""
         # Initial indexing
-        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client)
+        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client, indexing_config)
         
         # Wait to ensure different timestamp
         time.sleep(0.1)
@@ -229,23 +262,25 @@ def new_quantum_function():
 """)
         
         # Check modification detection
-        from code_indexer.server import _find_modified_files
+        from code_indexer.server import _find_modified_files, _find_new_files, _scan_workspace
         
-        all_data = collection.get()
-        modified_files = _find_modified_files(all_data.get('metadatas', []))
+        all_metadata = collection.get(include=["metadatas"])['metadatas'] or []
+        # One workspace walk shared by both detection helpers
+        current = _scan_workspace(temp_workspace)
+        modified_files = _find_modified_files(all_metadata, current)
         
         # Should detect the modified file
         assert main_file in modified_files, f"Modified file should be detected. Found modified: {modified_files}"
+        assert _find_new_files(all_metadata, temp_workspace, current) == []
         
         # For now, just verify the detection works - 
         # the actual reindexing would happen in the MCP server flow
     
     @pytest.mark.asyncio
-    async def test_new_file_detection_fix_works(self, temp_workspace, chroma_client):
+    async def test_new_file_detection_fix_works(self, temp_workspace, chroma_client, indexing_config):
         """Test that the fix allows new files to be detected and indexed."""
         # Initial indexing
-        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client)
-        initial_count = collection.count()
+        collection_name, collection = self.index_workspace_initially(temp_workspace, chroma_client, indexing_config)
         
         # Wait a moment to ensure different timestamp
         time.sleep(0.1)
@@ -265,11 +300,14 @@ def new_quantum_function():
         # Use the NEW detection function
         from code_indexer.server import _find_new_files
         
-        all_data = collection.get()
-        new_files = _find_new_files(all_data.get('metadatas', []), temp_workspace)
+        all_data = collection.get(include=["metadatas"])
+        initial_count = len(all_data['ids'])
+        indexed_files = {metadata['file_path'] for metadata in all_data['metadatas'] or [] if metadata}
+        new_files = _find_new_files(all_data['metadatas'] or [], temp_workspace)
         
         # Should detect the new file
         assert new_file in new_files, f"New file should be detected. Found: {new_files}"
+        assert not self.check_file_in_set(indexed_files, "bio_rhythm_tracker.py")
         
         # Simulate the indexing that would happen in _process_file_updates
         if new_files:
@@ -0,0 +1,78 @@
+"""Test the indexed file mtime sidecar."""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from code_indexer.file_mtimes import (
+    load_file_mtimes,
+    update_file_mtimes,
+    remove_file_mtimes,
+    sidecar_path,
+    sidecar_version
+)
+
+
+def test_file_mtimes_round_trip():
+    """Test merging, removing and replacing sidecar entries."""
+    with tempfile.TemporaryDirectory() as db_dir:
+        assert load_file_mtimes(db_dir, 'col') is None
+        
+        update_file_mtimes(db_dir, 'col', '/work', {'a.py': 1.5, 'b.py': 2.0})
+        update_file_mtimes(db_dir, 'col', '/work', {'c.py': 3.0}, removed=['a.py'])
+        assert load_file_mtimes(db_dir, 'col') == ('/work', {'b.py': 2.0, 'c.py': 3.0})
+        
+        update_file_mtimes(db_dir, 'col', '/work', {'d.py': 4.0}, replace=True)
+        assert load_file_mtimes(db_dir, 'col') == ('/work', {'d.py': 4.0})
+        assert load_file_mtimes(db_dir, 'other') is None
+        
+        remove_file_mtimes(db_dir, 'col')
+        remove_file_mtimes(db_dir, 'col')
+        assert load_file_mtimes(db_dir, 'col') is None
+
+
+def test_file_mtimes_ignores_corrupt_sidecar():
+    """Test a malformed sidecar reads as missing and is overwritten on update."""
+    with tempfile.TemporaryDirectory() as db_dir:
+        sidecar_path(db_dir, 'col').write_text('{"files": ')
+        assert load_file_mtimes(db_dir, 'col') is None
+        
+        update_file_mtimes(db_dir, 'col', '/work', {'a.py': 1.0})
+        assert load_file_mtimes(db_dir, 'col') == ('/work', {'a.py': 1.0})
+
+
+def test_file_mtimes_cache_follows_file():
+    """Test cached sidecars are copies and are re-read when another writer changes the file."""
+    with tempfile.TemporaryDirectory() as db_dir:
+        update_file_mtimes(db_dir, 'col', '/work', {'a.py': 1.0})
+        root, files = load_file_mtimes(db_dir, 'col')
+        files['b.py'] = 2.0
+        assert load_file_mtimes(db_dir, 'col') == ('/work', {'a.py': 1.0})
+        
+        # Written behind the module's back, as another process would
+        sidecar_path(db_dir, 'col').write_text(json.dumps({'collection_root': '/work', 'files': {'c.py': 3.25}}))
+        assert load_file_mtimes(db_dir, 'col') == ('/work', {'c.py': 3.25})
+        
+        sidecar_path(db_dir, 'col').unlink()
+        assert load_file_mtimes(db_dir, 'col') is None
+
+
+def test_sidecar_version_changes_with_writes():
+    """Test the sidecar version is None without a sidecar and changes on every write."""
+    with tempfile.TemporaryDirectory() as db_dir:
+        assert sidecar_version(db_dir, 'col') is None
+        
+        update_file_mtimes(db_dir, 'col', '/work', {'a.py': 1.0})
+        version = sidecar_version(db_dir, 'col')
+        assert version is not None
+        assert sidecar_version(db_dir, 'col') == version
+        
+        update_file_mtimes(db_dir, 'col', '/work', {'longer_name.py': 2.0})
+        assert sidecar_version(db_dir, 'col') != version
+        
+        remove_file_mtimes(db_dir, 'col')
+        assert sidecar_version(db_dir, 'col') is None
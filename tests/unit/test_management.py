@@ -1,6 +1,7 @@
 """Test management command functions."""
 
 import pytest
+import re
 import tempfile
 import sys
 from pathlib import Path
@@ -9,31 +10,24 @@ from unittest.mock import patch, MagicMock
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from manage import investigate_workspace, generate_collection_name
+from manage import investigate_workspace, generate_collection_name, _select_changed_files
 
 
-def test_investigate_workspace_nonexistent():
+def test_investigate_workspace_nonexistent(capsys):
     """Test investigating non-existent workspace."""
-    # Capture print output by redirecting to list
-    output = []
-    
-    with patch('builtins.print', side_effect=lambda *args: output.append(' '.join(map(str, args)))):
-        result = investigate_workspace('/nonexistent/path')
+    result = investigate_workspace('/nonexistent/path')
     
     assert result is None
-    assert any('Directory not found' in line for line in output)
+    assert 'Directory not found' in capsys.readouterr().out
 
 
-def test_investigate_workspace_file_not_directory():
+def test_investigate_workspace_file_not_directory(capsys):
     """Test investigating a file instead of directory."""
     with tempfile.NamedTemporaryFile() as temp_file:
-        output = []
-        
-        with patch('builtins.print', side_effect=lambda *args: output.append(' '.join(map(str, args)))):
-            result = investigate_workspace(temp_file.name)
+        result = investigate_workspace(temp_file.name)
         
         assert result is None
-        assert any('not a directory' in line for line in output)
+        assert 'not a directory' in capsys.readouterr().out
 
 
 def test_investigate_workspace_empty_directory():
@@ -41,21 +35,18 @@ def test_investigate_workspace_empty_directory():
     with tempfile.TemporaryDirectory() as temp_dir:
         # Set WORKSPACE_PATH for config
         with patch.dict('os.environ', {'WORKSPACE_PATH': temp_dir}):
-            output = []
-            
-            with patch('builtins.print', side_effect=lambda *args: output.append(' '.join(map(str, args)))):
-                result = investigate_workspace(temp_dir)
+            result = investigate_workspace(temp_dir)
             
             # Should complete successfully even with 0 files
             assert result is not None
             files, size, chunks, collection = result
-            assert files == 0
+            assert files == []
             assert size == 0
             assert chunks == 0
             assert isinstance(collection, str)
 
 
-def test_investigate_workspace_with_files():
+def test_investigate_workspace_with_files(capsys):
     """Test investigating workspace with actual files."""
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = Path(temp_dir)
@@ -72,22 +63,19 @@ def test_investigate_workspace_with_files():
         
         # Set WORKSPACE_PATH for config
         with patch.dict('os.environ', {'WORKSPACE_PATH': temp_dir}):
-            output = []
-            
-            with patch('builtins.print', side_effect=lambda *args: output.append(' '.join(map(str, args)))):
-                result = investigate_workspace(temp_dir)
+            result = investigate_workspace(temp_dir)
             
             assert result is not None
             files, size, chunks, collection = result
             
             # Should find 3 files (.py, .md, .json) but ignore node_modules
-            assert files == 3
+            assert len(files) == 3
             assert size > 0
             assert chunks > 0
             assert isinstance(collection, str)
             
             # Verify output mentions the correct files
-            output_text = ' '.join(output)
+            output_text = capsys.readouterr().out
             assert 'main.py' in output_text or '.py:' in output_text
             assert 'README.md' in output_text or '.md:' in output_text
 
@@ -103,8 +91,38 @@ def test_generate_collection_name_consistency():
     assert name1 == name2
     
     # Should be valid identifier
-    assert name1.replace('_', '').replace('0', '').replace('1', '').replace('2', '').replace('3', '').replace('4', '').replace('5', '').replace('6', '').replace('7', '').replace('8', '').replace('9', '').isalpha()
+    assert re.fullmatch(r'[A-Za-z0-9_]+', name1)
     
     # Should contain project name and hash
     assert 'my_awesome_project' in name1
-    assert '_' in name1  # Should have hash separator
\ No newline at end of file
+    assert '_' in name1  # Should have hash separator
+
+
+def test_select_changed_files():
+    """Test only new and modified files are re-indexed, using the files' own mtimes."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        unchanged = temp_path / 'unchanged.py'
+        edited = temp_path / 'edited.py'
+        added = temp_path / 'added.py'
+        for file_path in (unchanged, edited, added):
+            file_path.write_text('x = 1')
+        
+        mtime = unchanged.stat().st_mtime
+        collection = MagicMock()
+        collection.get.return_value = {
+            'ids': ['unchanged.py:a', 'edited.py:b', 'edited.py:c'],
+            'metadatas': [
+                # Stored a float ulp off the real mtime
+                {'file_path': 'unchanged.py', 'last_modified': mtime - 1e-7},
+                {'file_path': 'edited.py', 'last_modified': edited.stat().st_mtime - 10},
+                {'file_path': 'edited.py', 'last_modified': edited.stat().st_mtime - 10}
+            ]
+        }
+        
+        valid_files = [(file_path, 5) for file_path in (unchanged, edited, added)]
+        files_to_index, stored_ids = _select_changed_files(collection, valid_files, temp_dir)
+        
+        assert sorted(files_to_index) == sorted([edited, added])
+        assert stored_ids == {'edited.py': ['edited.py:b', 'edited.py:c']}
+        collection.delete.assert_not_called()
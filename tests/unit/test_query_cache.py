@@ -0,0 +1,77 @@
+"""Test the semantic query cache."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from code_indexer.query_cache import SemanticQueryCache, strip_no_cache_marker
+
+
+def test_cache_hit_on_similar_query():
+    """Test near-duplicate embeddings hit and dissimilar ones miss."""
+    cache = SemanticQueryCache(capacity=4, threshold=0.97)
+    
+    assert cache.get([1.0, 0.0, 0.0]) is None
+    
+    cache.put([1.0, 0.0, 0.0], "results for x")
+    assert cache.get([2.0, 0.01, 0.0]) == "results for x"  # same direction, different norm
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.get(np.array([0.7, 0.7, 0.0])) is None
+
+
+def test_cache_evicts_least_recently_used():
+    """Test the least recently used entry is evicted when full."""
+    cache = SemanticQueryCache(capacity=2)
+    
+    cache.put([1.0, 0.0, 0.0], "x")
+    cache.put([0.0, 1.0, 0.0], "y")
+    assert cache.get([1.0, 0.0, 0.0]) == "x"  # y is now least recently used
+    
+    cache.put([0.0, 0.0, 1.0], "z")
+    assert len(cache) == 2
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.get([1.0, 0.0, 0.0]) == "x"
+    assert cache.get([0.0, 0.0, 1.0]) == "z"
+
+
+def test_cache_clear_and_dimension_change():
+    """Test clearing and switching embedding dimension."""
+    cache = SemanticQueryCache()
+    cache.put([1.0, 0.0], "2d")
+    assert cache.get([1.0, 0.0, 0.0]) is None
+    
+    cache.put([1.0, 0.0, 0.0], "3d")
+    assert len(cache) == 1
+    assert cache.get([1.0, 0.0]) is None
+    
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get([1.0, 0.0, 0.0]) is None
+
+
+def test_strip_no_cache_marker():
+    """Test the cache bypass marker is only taken from the start or end of a query."""
+    assert strip_no_cache_marker("find auth handler") == ("find auth handler", False)
+    assert strip_no_cache_marker("find auth handler no-cache") == ("find auth handler", True)
+    assert strip_no_cache_marker("no-cache") == ("", True)
+    assert strip_no_cache_marker("no-cache\tfind  handler") == ("find handler", True)
+    assert strip_no_cache_marker("where do we set no-cache headers") == ("where do we set no-cache headers", False)
+    assert strip_no_cache_marker("handle-no-cache-flag") == ("handle-no-cache-flag", False)
+
+
+def test_cache_stores_float32_vectors():
+    """Test cached embeddings keep full float32 precision at the model's dimension."""
+    rng = np.random.default_rng(7)
+    vector = rng.standard_normal(384)
+    cache = SemanticQueryCache()
+    cache.put(vector, "hit")
+    
+    assert cache._vectors.dtype == np.float32
+    assert cache.get(vector) == "hit"
+    assert cache.get(vector + 0.05 * rng.standard_normal(384)) == "hit"
+    assert cache.get(rng.standard_normal(384)) is None
+    assert cache.get(np.zeros(384)) is None
@@ -1,8 +1,10 @@
 """Test utility functions."""
 
 import pytest
+import re
 import tempfile
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 # Add src to path for imports  
@@ -10,8 +12,22 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
 from code_indexer.utils import (
     should_ignore_path,
+    compile_ignore_patterns,
     generate_collection_name,
     is_file_indexable,
+    iter_files,
+    chunk_text,
+    chunk_document,
+    read_text_file,
+    chunk_hash,
+    hash_chunks,
+    load_file_chunks,
+    load_file_chunks_batch,
+    create_file_executor,
+    PROCESS_POOL_MIN_FILES,
+    PROCESS_POOL_CHUNKSIZE,
+    MTIME_TOLERANCE,
+    diff_file_mtimes,
     generate_chunk_id
 )
 
@@ -31,6 +47,44 @@ def test_should_ignore_path():
     assert not should_ignore_path(Path('/project/README.md'), ignore_patterns)
 
 
+def test_ignore_regex_matches_should_ignore_path():
+    """Test the compiled ignore regex and should_ignore_path agree on every pattern kind."""
+    ignore_patterns = frozenset({'.*', 'node_modules', '*.log', 'static/admin', '*.Upper', 'Dir/Upper'})
+    ignore_re = compile_ignore_patterns(ignore_patterns)
+    
+    paths = ['src/main.py', 'src/.env/x.py', './main.py', 'node_modules/a.js', 'my_node_modules/a.js',
+             'logs/APP.LOG', 'app.log.py', 'site/STATIC/ADMIN/x.css', 'a.upper', 'dir/upper/x.py']
+    for path in paths:
+        assert bool(ignore_re.search(path)) == should_ignore_path(path, ignore_patterns), path
+    
+    assert [path for path in paths if should_ignore_path(path, ignore_patterns)] == [
+        'src/.env/x.py', 'node_modules/a.js', 'logs/APP.LOG', 'site/STATIC/ADMIN/x.css']
+
+
+def test_iter_files():
+    """Test workspace walking prunes ignored directories."""
+    ignore_patterns = {'.venv', 'node_modules', '*.log', 'static/admin', '.*'}
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        
+        (temp_path / 'src').mkdir()
+        (temp_path / 'src' / 'main.py').write_text('print("hello")')
+        (temp_path / 'README.md').write_text('# Project')
+        (temp_path / 'app.log').write_text('log line')
+        (temp_path / 'node_modules' / 'pkg').mkdir(parents=True)
+        (temp_path / 'node_modules' / 'pkg' / 'index.js').write_text('module.exports = {}')
+        (temp_path / '.venv').mkdir()
+        (temp_path / '.venv' / 'lib.py').write_text('lib code')
+        (temp_path / 'static' / 'admin').mkdir(parents=True)
+        (temp_path / 'static' / 'admin' / 'admin.js').write_text('admin code')
+        (temp_path / 'static' / 'site.css').write_text('body {}')
+        
+        found = {Path(entry.path).relative_to(temp_path).as_posix() for entry in iter_files(temp_path, ignore_patterns)}
+    
+    assert found == {'src/main.py', 'README.md', 'static/site.css'}
+
+
 def test_generate_collection_name():
     """Test collection name generation."""
     # Test basic name generation
@@ -50,6 +104,23 @@ def test_generate_collection_name():
     # Should be safe identifiers
     assert name1.replace('_', '').isalnum()
     assert name2.replace('_', '').isalnum()
+    
+    # Characters Chroma rejects in names are dropped, including non-ASCII letters
+    assert re.fullmatch(r'caf_project_[0-9a-f]{8}', generate_collection_name('/path/to/Café Project'))
+
+
+def test_generate_collection_name_matches_existing_collections(monkeypatch, tmp_path):
+    """Test names stay exactly as collections were created with, for relative and trailing-slash paths."""
+    monkeypatch.chdir('/')
+    assert generate_collection_name('.') == '_8a5edab2'
+    assert generate_collection_name('./') == '_8a5edab2'
+    
+    assert generate_collection_name('/srv/My-Project/') == 'my_project_ff7eaded'
+    assert generate_collection_name('/srv/My-Project') == 'my_project_ff7eaded'
+    
+    # The folder name is taken from the path as given, not its absolute form
+    monkeypatch.chdir(tmp_path)
+    assert re.fullmatch(r'_[0-9a-f]{8}', generate_collection_name('.'))
 
 
 def test_is_file_indexable():
@@ -66,7 +137,7 @@ def test_is_file_indexable():
         py_file.write_text('print("hello")')
         
         large_file = temp_path / 'large.py'
-        large_file.write_text('x' * (2 * 1024 * 1024))  # 2MB
+        large_file.write_bytes(b'x' * (2 * 1024 * 1024))  # 2MB
         
         ignored_file = temp_path / '.venv' / 'lib.py'
         ignored_file.parent.mkdir()
@@ -94,22 +165,145 @@ def test_is_file_indexable():
         indexable, reason = is_file_indexable(binary_file, allowed_extensions, ignore_patterns, max_file_size)
         assert not indexable
         assert "not in allowlist" in reason
+        
+        # A stat result from the caller is used instead of stat()ing again
+        indexable, reason = is_file_indexable(py_file, allowed_extensions, ignore_patterns, max_file_size,
+                                              stat_result=large_file.stat())
+        assert not indexable
+        assert "file too large" in reason
+        
+        # Missing files and directories are not indexable
+        package_dir = temp_path / 'package.py'
+        package_dir.mkdir()
+        assert is_file_indexable(temp_path / 'missing.py', allowed_extensions, ignore_patterns, max_file_size)[1] == "not a file"
+        assert is_file_indexable(package_dir, allowed_extensions, ignore_patterns, max_file_size)[1] == "not a file"
+        
+        # Extension and ignore checks come before the stat, so missing paths fail them first
+        assert "not in allowlist" in is_file_indexable(temp_path / 'missing.png', allowed_extensions, ignore_patterns, max_file_size)[1]
+        assert is_file_indexable(temp_path / 'node_modules' / 'missing.js', allowed_extensions, ignore_patterns,
+                                 max_file_size)[1] == "path matches ignore pattern"
+
+
+def test_diff_file_mtimes():
+    """Test new, modified and deleted files, with float round-trip noise ignored."""
+    indexed = {'same.py': 100.0, 'noisy.py': 100.0, 'edited.py': 100.0, 'gone.py': 100.0}
+    current = {'same.py': 100.0, 'noisy.py': 100.0 + MTIME_TOLERANCE / 2, 'edited.py': 101.0, 'added.py': 5.0}
+    
+    assert diff_file_mtimes(indexed, current) == (['added.py'], ['edited.py'], ['gone.py'])
+    
+    # With candidates, only those paths can be reported deleted
+    assert diff_file_mtimes(indexed, {'edited.py': 101.0}, {'edited.py', 'gone.py'}) == ([], ['edited.py'], ['gone.py'])
+    assert diff_file_mtimes(indexed, {}, {'added.py'}) == ([], [], [])
 
 
 def test_generate_chunk_id():
     """Test chunk ID generation."""
-    file_path = Path('/project/src/main.py')
+    content_hash = chunk_hash('print("hello")')
     
-    # Test with timestamp
-    chunk_id = generate_chunk_id(file_path, 0, 1234567890)
-    assert 'main.py' in chunk_id
-    assert '0' in chunk_id
-    assert '1234567890' in chunk_id
+    chunk_id = generate_chunk_id('src/main.py', content_hash)
+    assert chunk_id == f"src/main.py:{content_hash[:16]}"
     
-    # Test without timestamp (uses current time)
-    chunk_id2 = generate_chunk_id(file_path, 1)
-    assert 'main.py' in chunk_id2
-    assert '1' in chunk_id2
+    # Same content gives the same ID; other files or content give different IDs
+    assert generate_chunk_id('src/main.py', chunk_hash('print("hello")')) == chunk_id
+    assert generate_chunk_id('src/other.py', content_hash) != chunk_id
+    assert generate_chunk_id('src/main.py', chunk_hash('print("bye")')) != chunk_id
+
+
+def test_chunk_hash():
+    """Test chunk content hashes are stable and content-sensitive."""
+    assert chunk_hash('def main():\n    pass') == chunk_hash('def main():\n    pass')
+    assert chunk_hash('def main():\n    pass') != chunk_hash('def main():\n    return')
+    assert len(chunk_hash('x')) == 32
+
+
+def test_hash_chunks():
+    """Test repeated chunks within a file are hashed once."""
+    hashed = hash_chunks(['a = 1', 'b = 2', 'a = 1'])
+    assert [(i, chunk) for i, chunk, _ in hashed] == [(0, 'a = 1'), (1, 'b = 2')]
+    assert hashed[0][2] == chunk_hash('a = 1')
+
+def test_chunk_text():
+    """Test boundary-aware chunking with overlap."""
+    assert chunk_text("") == []
+    assert chunk_text("short file\n") == ["short file"]
+    
+    lines = [f"line {i} of the file" for i in range(200)]
+    text = "\n".join(lines)
+    chunks = chunk_text(text, target=200, overlap=50)
+    
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    # Chunks end on whole lines, and every line is kept
+    assert all(chunk.split("\n")[-1] in lines for chunk in chunks)
+    assert set(lines) <= {line for chunk in chunks for line in chunk.split("\n")}
+    # Consecutive chunks overlap
+    assert chunks[0].split("\n")[-1] in chunks[1]
+    
+    # Markdown keeps paragraph chunks
+    assert chunk_document("# Title\n\nPara one.\n\n\nPara two.", ".md") == ["# Title", "Para one.", "Para two."]
+
+
+def test_read_text_file():
+    """Test text reading skips binary and oversized files."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        
+        text_file = temp_path / 'main.py'
+        text_file.write_bytes(b'a = 1\r\nb = 2\rc = 3\n')
+        assert read_text_file(text_file) == ('a = 1\nb = 2\nc = 3\n', '')
+        
+        binary_file = temp_path / 'data.txt'
+        binary_file.write_bytes(b'PK\x03\x04\x00\x00rest')
+        content, reason = read_text_file(binary_file)
+        assert content is None
+        assert 'binary' in reason
+        
+        content, reason = read_text_file(text_file, max_file_size=4)
+        assert content is None
+        assert 'file too large' in reason
+        assert read_text_file(text_file, max_file_size=1024)[0] is not None
+
+
+def test_load_file_chunks():
+    """Test files are read, chunked and hashed in one call, with skip reasons."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        
+        text_file = temp_path / 'main.py'
+        text_file.write_text('a = 1\n')
+        file_path, hashed, reason, mtime = load_file_chunks(str(text_file), max_file_size=1024)
+        assert file_path == text_file
+        assert hashed == [(0, 'a = 1', chunk_hash('a = 1'))]
+        assert reason == ''
+        assert mtime == text_file.stat().st_mtime
+        
+        _, hashed, reason, _ = load_file_chunks(text_file, max_file_size=2)
+        assert hashed is None
+        assert 'file too large' in reason
+        
+        _, hashed, reason, _ = load_file_chunks(temp_path / 'missing.py')
+        assert hashed is None
+        assert reason.startswith('read error')
+
+
+def test_create_file_executor():
+    """Test threads by default and a process pool with batched tasks only for large opted-in runs."""
+    for file_count, use_processes in ((PROCESS_POOL_MIN_FILES, False), (PROCESS_POOL_MIN_FILES - 1, True)):
+        executor, files_per_task = create_file_executor(file_count, use_processes=use_processes)
+        with executor:
+            assert isinstance(executor, ThreadPoolExecutor)
+            assert files_per_task == 1
     
-    # Different chunk indices should give different IDs
-    assert chunk_id != chunk_id2
\ No newline at end of file
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = []
+        for i in range(3):
+            path = Path(temp_dir) / f'm{i}.py'
+            path.write_text(f'x = {i}')
+            paths.append(path)
+        
+        executor, files_per_task = create_file_executor(PROCESS_POOL_MIN_FILES, use_processes=True)
+        with executor:
+            assert isinstance(executor, ProcessPoolExecutor)
+            assert files_per_task == PROCESS_POOL_CHUNKSIZE
+            results = executor.submit(load_file_chunks_batch, paths).result()
+        assert [hashed[0][1] for _, hashed, _, _ in results] == ['x = 0', 'x = 1', 'x = 2']
\ No newline at end of file
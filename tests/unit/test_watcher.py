@@ -0,0 +1,87 @@
+"""Test the filesystem watcher's change bookkeeping."""
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from code_indexer import watcher as watcher_module
+from code_indexer.watcher import WorkspaceWatcher
+
+ROOT = os.path.join(os.sep, 'work')
+
+
+def _event(event_type, src, dest=None, is_directory=False):
+    return SimpleNamespace(event_type=event_type, src_path=os.path.join(ROOT, src),
+                           dest_path=dest and os.path.join(ROOT, dest), is_directory=is_directory)
+
+
+def _drained_watcher():
+    watcher = WorkspaceWatcher(ROOT, {'node_modules', '*.min.js'})
+    assert watcher.drain() is None  # First check always walks
+    return watcher
+
+
+def test_watcher_collects_changed_files():
+    """Test file events are drained once, skipping paths the walk would not index."""
+    watcher = _drained_watcher()
+    
+    watcher.dispatch(_event('modified', 'a.py'))
+    watcher.dispatch(_event('created', os.path.join('pkg', 'b.py')))
+    watcher.dispatch(_event('deleted', 'c.py'))
+    watcher.dispatch(_event('moved', 'd.py', 'e.py'))
+    watcher.dispatch(_event('opened', 'f.py'))
+    watcher.dispatch(_event('modified', os.path.join('node_modules', 'g.py')))
+    watcher.dispatch(_event('modified', 'app.min.js'))
+    watcher.dispatch(_event('modified', 'image.png'))
+    watcher.dispatch(_event('modified', 'pkg', is_directory=True))
+    
+    assert watcher.drain() == {'a.py', os.path.join('pkg', 'b.py'), 'c.py', 'd.py', 'e.py'}
+    assert watcher.drain() == set()
+
+
+def test_watcher_falls_back_to_full_scan():
+    """Test directory moves, stray paths, overflow, failures and the periodic interval force a full walk."""
+    watcher = _drained_watcher()
+    watcher.dispatch(_event('moved', 'old', 'new', is_directory=True))
+    watcher.dispatch(_event('modified', 'a.py'))
+    assert watcher.drain() is None
+    
+    # Ignored directories can't hold indexed files
+    watcher.dispatch(_event('created', 'node_modules', is_directory=True))
+    assert watcher.drain() == set()
+    
+    watcher.dispatch(_event('modified', 'a.py'))
+    watcher.record(os.path.join(os.sep, 'elsewhere', 'h.py'))
+    assert watcher.drain() is None
+    
+    watcher.dispatch(_event('modified', 'a.py'))
+    watcher.request_full_scan()
+    assert watcher.drain() is None
+    
+    for i in range(watcher_module.MAX_PENDING_PATHS + 1):
+        watcher.record(os.path.join(ROOT, f'{i}.py'))
+    assert watcher.drain() is None
+    
+    watcher._last_full_scan -= watcher_module.FULL_SCAN_INTERVAL
+    assert watcher.drain() is None
+    assert watcher.drain() == set()
+
+
+def test_watcher_accepts_resolved_paths(tmp_path):
+    """Test events reported under the resolved workspace path are recorded."""
+    real = tmp_path / 'real'
+    (real / 'pkg').mkdir(parents=True)
+    link = tmp_path / 'link'
+    link.symlink_to(real)
+    
+    watcher = WorkspaceWatcher(link, set())
+    assert watcher.drain() is None
+    watcher.record(str(real / 'a.py'))
+    watcher.record(str(link / 'pkg' / 'b.py'))
+    watcher.record(str(real / 'pkg' / 'c.py'))
+    
+    assert watcher.drain() == {'a.py', os.path.join('pkg', 'b.py'), os.path.join('pkg', 'c.py')}